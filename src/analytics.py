@@ -0,0 +1,269 @@
+import argparse
+import os
+from multiprocessing import Pool
+from typing import List
+from src.game_archive import GameArchive, GameRecord, HIT, HIT_DESTROYED
+from src.utils import *
+
+SIDES = ('player', 'bot')
+RULES = ('all', 'single', 'salvo')
+
+
+class GameStats:
+    """
+    Aggregate statistics over a set of games.
+
+    Every field is a fixed-size counter (per cell, per turn or per ship size),
+    so memory does not grow with the number of games, and two GameStats
+    built from disjoint sets of games can be merged by adding the counters.
+    Per-side fields are keyed by the side that fired the shots. A turn is one
+    shot, or one whole salvo in games played with salvo rules.
+    """
+
+    def __init__(self, board_size: int = BOARD_SIZE):
+        cells = board_size * board_size
+        self.board_size = board_size
+        self.games = 0
+        self.salvo_games = 0
+        self.wins = {'player': 0, 'bot': 0, 'unfinished': 0}
+        self.shots = {side: [0] * cells for side in SIDES}          # shots per cell
+        self.hits = {side: [0] * cells for side in SIDES}           # hits per cell
+        self.turn_shots = {side: [0] * (cells + 1) for side in SIDES}  # shots by turn number
+        self.turn_hits = {side: [0] * (cells + 1) for side in SIDES}   # hits by turn number
+        self.turns_to_win = {side: [0] * (cells + 1) for side in SIDES}
+        self.first_sunk = {side: {} for side in SIDES}              # ship size -> games
+
+    def add_game(self, game: GameRecord):
+        """Fold one archived game into the counters"""
+        self.games += 1
+        self.salvo_games += game.salvo
+        fleets = {'player': game.bot_ships, 'bot': game.player_ships}  # fleet each side fires at
+        turns = {'player': 0, 'bot': 0}
+        sunk = {'player': 0, 'bot': 0}
+        winner = None
+        last_side = None
+
+        for i in range(len(game.moves)):
+            byte = game.moves[i]
+            side = 'bot' if byte & 0x80 else 'player'
+            cell = byte & 0x7F
+            result = (game.outcomes[i // 4] >> (2 * (i % 4))) & 0b11
+            if side != last_side:  # sides alternate, so a new side starts a new turn
+                turns[side] += 1
+                last_side = side
+            turn = turns[side]
+
+            self.shots[side][cell] += 1
+            self.turn_shots[side][turn] += 1
+            if result == HIT or result == HIT_DESTROYED:
+                self.hits[side][cell] += 1
+                self.turn_hits[side][turn] += 1
+
+            if result == HIT_DESTROYED:
+                if sunk[side] == 0:
+                    coord = divmod(cell, game.board_size)
+                    size = next(len(ship) for ship in fleets[side] if coord in ship)
+                    self.first_sunk[side][size] = self.first_sunk[side].get(size, 0) + 1
+                sunk[side] += 1
+                if sunk[side] == len(fleets[side]):
+                    winner = side
+
+        if winner is None:
+            self.wins['unfinished'] += 1
+        else:
+            self.wins[winner] += 1
+            self.turns_to_win[winner][turns[winner]] += 1
+
+    def merge(self, other: 'GameStats') -> 'GameStats':
+        """Add another partial aggregate into this one"""
+        if other.board_size != self.board_size:
+            raise ValueError(f"Cannot merge {other.board_size}x{other.board_size} statistics "
+                             f"into {self.board_size}x{self.board_size} ones")
+        self.games += other.games
+        self.salvo_games += other.salvo_games
+        for key, count in other.wins.items():
+            self.wins[key] += count
+        for side in SIDES:
+            for mine, theirs in ((self.shots, other.shots), (self.hits, other.hits),
+                                 (self.turn_shots, other.turn_shots), (self.turn_hits, other.turn_hits),
+                                 (self.turns_to_win, other.turns_to_win)):
+                mine[side] = [a + b for a, b in zip(mine[side], theirs[side])]
+            for size, count in other.first_sunk[side].items():
+                self.first_sunk[side][size] = self.first_sunk[side].get(size, 0) + count
+        return self
+
+
+def _analyze_range(args) -> GameStats:
+    """Worker: aggregate the games in [start, stop) of an archive that were played under `rules`"""
+    filename, start, stop, rules = args
+    with GameArchive(filename) as archive:
+        stats = GameStats(archive.board_size)
+        for n in range(start, stop):
+            game = archive[n]
+            if rules == 'all' or game.salvo == (rules == 'salvo'):
+                stats.add_game(game)
+        del game
+    return stats
+
+def analyze_archives(filenames: List[str], workers: int = None, chunk_size: int = 5000,
+                     rules: str = 'all') -> GameStats:
+    """
+    Aggregate every game of the given archives.
+
+    Archives are split into chunks of `chunk_size` games; each chunk is
+    aggregated by a worker process straight from the memory-mapped archive
+    and the partial results are merged as they arrive, so only one partial
+    aggregate per worker is alive at any time. All archives must hold games
+    on the same board size. `rules` keeps only single-shot or only salvo games.
+    """
+    chunks = []
+    board_sizes = {}
+    for filename in filenames:
+        with GameArchive(filename) as archive:
+            board_sizes[filename] = archive.board_size
+            chunks.extend((filename, start, min(start + chunk_size, len(archive)), rules)
+                          for start in range(0, len(archive), chunk_size))
+
+    if len(set(board_sizes.values())) > 1:
+        raise ValueError("Archives hold games on different board sizes: " + ", ".join(
+            f"{filename} {size}x{size}" for filename, size in board_sizes.items()))
+
+    total = GameStats(next(iter(board_sizes.values()), BOARD_SIZE))
+    with Pool(workers or os.cpu_count() or 1) as pool:
+        for partial in pool.imap_unordered(_analyze_range, chunks):
+            total.merge(partial)
+    return total
+
+
+def _heatmap_lines(counts: List[int], board_size: int) -> List[str]:
+    """Render per-cell counts as digits 0-9 relative to the busiest cell"""
+    peak = max(counts) or 1
+    lines = ["   " + " ".join(chr(ord('A') + c) for c in range(board_size))]
+    for row in range(board_size):
+        cells = counts[row * board_size:(row + 1) * board_size]
+        lines.append(f"{row+1:2} " + " ".join(str(min(9, 10 * n // peak)) for n in cells))
+    return lines
+
+def print_report(stats: GameStats):
+    """Print the aggregate statistics"""
+    print("\n" + "="*50)
+    print(f"GAME ANALYTICS ({stats.games} games, {stats.salvo_games} with salvo rules)")
+    print("="*50)
+
+    finished = stats.wins['player'] + stats.wins['bot']
+    if finished:
+        print(f"\nPlayer wins: {stats.wins['player']} ({100 * stats.wins['player'] / finished:.1f}%)")
+        print(f"Bot wins:    {stats.wins['bot']} ({100 * stats.wins['bot'] / finished:.1f}%)")
+    print(f"Unfinished:  {stats.wins['unfinished']}")
+
+    for side in SIDES:
+        print(f"\n--- {side.capitalize()} shots ---")
+
+        wins = stats.turns_to_win[side]
+        if sum(wins):
+            average = sum(turn * n for turn, n in enumerate(wins)) / sum(wins)
+            shortest = next(turn for turn, n in enumerate(wins) if n)
+            longest = max(turn for turn, n in enumerate(wins) if n)
+            print(f"Turns to win: average {average:.1f}, shortest {shortest}, longest {longest}")
+
+        first = stats.first_sunk[side]
+        if first:
+            total = sum(first.values())
+            print("First ship sunk: " + ", ".join(
+                f"size {size} {100 * first[size] / total:.1f}%" for size in sorted(first, reverse=True)))
+
+        print("Hit rate by turn:")
+        for start in range(1, len(stats.turn_shots[side]), 10):
+            shots = sum(stats.turn_shots[side][start:start + 10])
+            if shots:
+                hits = sum(stats.turn_hits[side][start:start + 10])
+                print(f"  turns {start:3}-{start + 9:3}: {100 * hits / shots:5.1f}% of {shots} shots")
+
+        print("Shot heatmap (0-9, relative to the most targeted cell):")
+        for line in _heatmap_lines(stats.shots[side], stats.board_size):
+            print("  " + line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate statistics over game archives")
+    parser.add_argument('archives', nargs='*', default=['data/games.bsa'], help="Archive files")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Games per work unit")
+    parser.add_argument('--rules', choices=RULES, default='all', help="Only single-shot or only salvo games")
+    parser.add_argument('--test', action='store_true', help="Run the self-test instead")
+    args = parser.parse_args()
+
+    if args.test:
+        test_analytics()
+        return
+    try:
+        stats = analyze_archives(args.archives, args.workers, args.chunk_size, args.rules)
+    except FileNotFoundError as e:
+        print(f"No archived games yet: {e.filename} does not exist (play a game or run python -m src.simulation)")
+        return
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    print_report(stats)
+
+
+def test_analytics():
+    """Test that chunked, parallel aggregation matches one serial pass"""
+    import random
+    import tempfile
+    from src.bot_generation import generate_bot_ships
+    from src.game_archive import GameArchiveWriter, HEADER, MAGIC, VERSION
+    from src.simulation import play_headless_game
+
+    print("Testing analytics...")
+    with tempfile.TemporaryDirectory() as tmp:
+        filenames = [os.path.join(tmp, 'first.bsa'), os.path.join(tmp, 'second.bsa')]
+        random.seed(0)
+        for filename, games in zip(filenames, (23, 17)):
+            with GameArchiveWriter(filename) as writer:
+                for game in range(games):
+                    player_ships, bot_ships = generate_bot_ships(), generate_bot_ships()
+                    salvo = 0 if game % 4 == 0 else None
+                    _, moves = play_headless_game(player_ships, bot_ships, salvo=salvo)
+                    writer.append(player_ships, bot_ships, moves, salvo is not None)
+
+        serial = GameStats()
+        for filename in filenames:
+            with GameArchive(filename) as archive:
+                for game in archive:
+                    serial.add_game(game)
+                del game
+
+        merged = analyze_archives(filenames, workers=2, chunk_size=6)
+        if vars(merged) != vars(serial):
+            print("ERROR: Merged chunks differ from a serial pass!")
+            return False
+        if serial.games != 40 or sum(serial.wins.values()) != 40 or serial.wins['unfinished']:
+            print("ERROR: Wrong game or win counts!")
+            return False
+
+        salvo = analyze_archives(filenames, workers=1, rules='salvo')
+        single = analyze_archives(filenames, workers=1, rules='single')
+        if (salvo.games, salvo.salvo_games, single.games, single.salvo_games) != (11, 11, 29, 0):
+            print("ERROR: Wrong games kept by the rules filter!")
+            return False
+        # The player's first turn is one shot, or one shot per ship in a salvo game
+        for stats, first_turn in ((single, 1), (salvo, len(SHIP_SIZES))):
+            if stats.turn_shots['player'][1] != stats.games * first_turn:
+                print("ERROR: Salvo shots were not counted as one turn!")
+                return False
+
+        small = os.path.join(tmp, 'small.bsa')
+        with open(small, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 8))
+        open(small + '.idx', 'wb').close()
+        try:
+            analyze_archives(filenames + [small], workers=1)
+            print("ERROR: Mixed board sizes were accepted!")
+            return False
+        except ValueError:
+            pass
+
+    print("All tests passed!")
+    return True
+
+if __name__ == "__main__":
+    main()
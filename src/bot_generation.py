@@ -1,8 +1,25 @@
+import os
 import random
-from typing import List, Tuple, Set
+from typing import List, Optional, Tuple, Set
 from src.utils import *
 
-def generate_bot_ships() -> List[List[Tuple[int, int]]]:
+def random_ship_position(size: int, rng: random.Random = None) -> List[Tuple[int, int]]:
+    """Pick a random straight position for a ship of the given size inside the board"""
+    rng = rng or random
+    
+    # Random orientation
+    horizontal = rng.choice([True, False])
+    
+    if horizontal:
+        row = rng.randint(0, BOARD_SIZE - 1)
+        col = rng.randint(0, BOARD_SIZE - size)
+        return [(row, col + i) for i in range(size)]
+    else:
+        row = rng.randint(0, BOARD_SIZE - size)
+        col = rng.randint(0, BOARD_SIZE - 1)
+        return [(row + i, col) for i in range(size)]
+
+def generate_bot_ships(rng: random.Random = None) -> List[List[Tuple[int, int]]]:
     """Generate random valid ship placement for the bot"""
     max_attempts = 10000
     
@@ -13,18 +30,7 @@ def generate_bot_ships() -> List[List[Tuple[int, int]]]:
         ship_placed = False
         
         for _ in range(1000):
-            # Random orientation
-            horizontal = random.choice([True, False])
-            
-            if horizontal:
-                row = random.randint(0, BOARD_SIZE - 1)
-                col = random.randint(0, BOARD_SIZE - size)
-                coords = [(row, col + i) for i in range(size)]
-            else:
-                row = random.randint(0, BOARD_SIZE - size)
-                col = random.randint(0, BOARD_SIZE - 1)
-                coords = [(row + i, col) for i in range(size)]
-            
+            coords = random_ship_position(size, rng)
             ship_set = set(coords)
             
             # Check if placement is valid
@@ -39,10 +45,39 @@ def generate_bot_ships() -> List[List[Tuple[int, int]]]:
         
         if not ship_placed:
             # Failed to place this ship, restart
-            return generate_bot_ships()
+            return generate_bot_ships(rng)
     
     return ships
 
+def pick_hard_layout(filename: str = 'data/hard_layouts.csv') -> Optional[List[List[Tuple[int, int]]]]:
+    """
+    Pick a bot fleet from a pool written by the placement optimizer.
+
+    A random rotation/reflection of the board is applied so the same few
+    layouts do not keep coming back in the same place. Returns None when
+    there is no pool.
+    """
+    if not os.path.exists(filename):
+        return None
+    layouts = load_layouts_from_csv(filename)
+    if not layouts:
+        return None
+    
+    _, ships = random.choice(layouts)
+    last = BOARD_SIZE - 1
+    symmetries = [
+        lambda r, c: (r, c),
+        lambda r, c: (r, last - c),
+        lambda r, c: (last - r, c),
+        lambda r, c: (last - r, last - c),
+        lambda r, c: (c, r),
+        lambda r, c: (c, last - r),
+        lambda r, c: (last - c, r),
+        lambda r, c: (last - c, last - r),
+    ]
+    transform = random.choice(symmetries)
+    return [sorted(transform(r, c) for r, c in ship) for ship in ships]
+
 def test_generation():
     """Test bot ship generation"""
     print("Testing bot ship generation...")
@@ -0,0 +1,225 @@
+import argparse
+import os
+import random
+import time
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Tuple
+from src.utils import *
+
+# Cell codes of the board the density is computed on
+UNKNOWN = 0
+BLOCKED = 1  # miss, sunk ship or marked around a sunk ship
+HIT = 2      # hit on a ship that is still afloat
+
+
+def count_lines(board, board_size: int, vertical: bool, line_start: int, line_stop: int,
+                ship_counts: Dict[int, int], out):
+    """
+    Count, for every cell on rows [line_start, line_stop) (columns if
+    `vertical`), the placements of the remaining ships along that line that
+    cover it, and write the counts to `out[cell]`.
+
+    A placement may not contain a blocked cell. When there are unresolved
+    hits only placements through them count, weighted by the number of hits
+    they cover, which turns the heatmap from hunting into targeting. Cells
+    that cannot be fired at get 0, and single-cell ships are only counted
+    along rows. The density of a cell is its row count plus its column
+    count; every line is counted whole, so lines can be split between
+    workers without any overlap.
+    """
+    n = board_size
+    targeting = HIT in board
+    step = n if vertical else 1
+
+    for line in range(line_start, line_stop):
+        first_cell = line if vertical else line * n
+        line_cells = range(first_cell, first_cell + step * n, step)
+        codes = [board[cell] for cell in line_cells]
+        blocked_prefix = [0]
+        hit_prefix = [0]
+        for code in codes:
+            blocked_prefix.append(blocked_prefix[-1] + (code == BLOCKED))
+            hit_prefix.append(hit_prefix[-1] + (code == HIT))
+
+        diff = [0] * (n + 1)
+        for size, count in ship_counts.items():
+            if size == 1 and vertical:
+                continue  # single cells are counted once, along rows
+            for start in range(n - size + 1):
+                end = start + size
+                if blocked_prefix[end] - blocked_prefix[start]:
+                    continue
+                weight = count * (hit_prefix[end] - hit_prefix[start]) if targeting else count
+                if weight:
+                    diff[start] += weight
+                    diff[end] -= weight
+
+        running = 0
+        for i, cell in enumerate(line_cells):
+            running += diff[i]
+            out[cell] = running if codes[i] == UNKNOWN else 0
+
+
+def compute_density(board, board_size: int, ship_counts: Dict[int, int]) -> List[int]:
+    """Placement counts for every cell, in this process"""
+    cells = board_size * board_size
+    rows, cols = [0] * cells, [0] * cells
+    count_lines(board, board_size, False, 0, board_size, ship_counts, rows)
+    count_lines(board, board_size, True, 0, board_size, ship_counts, cols)
+    return [a + b for a, b in zip(rows, cols)]
+
+
+def split_lines(board_size: int, workers: int, bands_per_worker: int = 2) -> List[Tuple[bool, int, int]]:
+    """Work units for a pool: (vertical, first line, stop line) bands of rows and of columns"""
+    bands = min(board_size, workers * bands_per_worker)
+    edges = [board_size * i // bands for i in range(bands + 1)]
+    return [(vertical, start, stop) for vertical in (False, True) for start, stop in zip(edges, edges[1:])]
+
+
+# Worker-side handles to the shared board and counts, set by _attach
+_shared = {}
+
+def _attach(board_name: str, counts_name: str, board_size: int):
+    """Pool initializer: map the shared board and counts once per worker"""
+    cells = board_size * board_size
+    _shared['board_memory'] = SharedMemory(name=board_name)
+    _shared['counts_memory'] = SharedMemory(name=counts_name)
+    _shared['board'] = _shared['board_memory'].buf
+    counts = _shared['counts_memory'].buf.cast('q')
+    _shared['counts'] = {False: counts[:cells], True: counts[cells:]}
+    _shared['board_size'] = board_size
+
+def _count_shared_lines(args):
+    """Worker: count one band of rows or columns straight into the shared counts array"""
+    vertical, line_start, line_stop, ship_counts = args
+    count_lines(_shared['board'], _shared['board_size'], vertical, line_start, line_stop,
+                dict(ship_counts), _shared['counts'][vertical])
+
+
+class DensityEngine:
+    """
+    Placement-density heatmaps computed by a pool of worker processes.
+
+    The board and the per-cell counts live in shared memory. Each move the
+    board is copied in once and the work is split into bands of rows (for
+    horizontal placements) and bands of columns (for vertical ones). Every
+    line is counted whole by one worker, so no work is repeated, and each
+    worker writes its cells directly into the row or column half of the
+    shared array; the halves are added up once at the end. The pool stays
+    alive between moves, which keeps the latency of a single move low.
+    """
+
+    def __init__(self, board_size: int, workers: int = None, bands_per_worker: int = 2):
+        self.board_size = board_size
+        self.workers = workers or os.cpu_count() or 1
+        cells = board_size * board_size
+        self._board_memory = SharedMemory(create=True, size=cells)
+        self._counts_memory = SharedMemory(create=True, size=2 * cells * 8)
+        self._board = self._board_memory.buf
+        self._counts = self._counts_memory.buf.cast('q')
+
+        self._tasks = split_lines(board_size, self.workers, bands_per_worker)
+        self._pool = Pool(self.workers, initializer=_attach,
+                          initargs=(self._board_memory.name, self._counts_memory.name, board_size))
+
+    def density(self, board, ship_counts: Dict[int, int]) -> List[int]:
+        """Placement counts for every cell of `board` (a sequence of cell codes)"""
+        self._board[:] = bytes(board)
+        ship_items = tuple(sorted(ship_counts.items()))
+        self._pool.map(_count_shared_lines, [task + (ship_items,) for task in self._tasks])
+        counts = self._counts.tolist()
+        cells = self.board_size * self.board_size
+        return [a + b for a, b in zip(counts[:cells], counts[cells:])]
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        self._board.release()
+        self._counts.release()
+        for memory in (self._board_memory, self._counts_memory):
+            memory.close()
+            memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pick_densest_cell(density: List[int], board, board_size: int) -> Tuple[int, int]:
+    """Choose randomly among the unknown cells with the highest count"""
+    best = max(value for cell, value in enumerate(density) if board[cell] == UNKNOWN)
+    candidates = [cell for cell, value in enumerate(density) if value == best and board[cell] == UNKNOWN]
+    return divmod(random.choice(candidates), board_size)
+
+
+def _random_position(board_size: int, ships: List[int], rng: random.Random) -> Tuple[bytearray, Dict[int, int]]:
+    """A board part way through a game, for benchmarking: random misses and one unresolved hit"""
+    board = bytearray(board_size * board_size)
+    for cell in rng.sample(range(len(board)), len(board) // 3):
+        board[cell] = BLOCKED
+    board[rng.choice([cell for cell, code in enumerate(board) if code == UNKNOWN])] = HIT
+    counts = {}
+    for size in ships:
+        counts[size] = counts.get(size, 0) + 1
+    return board, counts
+
+def _time_tasks(positions, board_size: int, tasks: List[Tuple[bool, int, int]], repeats: int = 3) -> float:
+    """Best time per position to run every work unit one after another in this process"""
+    out = [0] * (board_size * board_size)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for board, counts in positions:
+            for vertical, line_start, line_stop in tasks:
+                count_lines(board, board_size, vertical, line_start, line_stop, counts, out)
+        best = min(best, time.perf_counter() - start)
+    return best / len(positions)
+
+def benchmark(board_size: int = 50, ships: List[int] = None, workers_list: List[int] = None, moves: int = 20):
+    """
+    Time one density computation serially and with growing worker pools.
+
+    For every pool size it also reports the total work of its split (all the
+    work units run one after another) relative to one serial pass, which
+    bounds the speed-up the split allows even on a machine with one core.
+    """
+    ships = ships or [6] * 2 + [5] * 4 + [4] * 6 + [3] * 8 + [2] * 10 + [1] * 10
+    workers_list = workers_list or sorted({1, 2, 4, os.cpu_count() or 1})
+    rng = random.Random(0)
+    positions = [_random_position(board_size, ships, rng) for _ in range(moves)]
+
+    start = time.perf_counter()
+    expected = [compute_density(board, board_size, counts) for board, counts in positions]
+    serial = (time.perf_counter() - start) / moves
+    one_pass = _time_tasks(positions, board_size, split_lines(board_size, 1, 1))
+    print(f"{board_size}x{board_size}, {len(ships)} ships, {os.cpu_count()} cores available")
+    print(f"  in-process : {serial * 1000:7.2f} ms per move")
+
+    for workers in workers_list:
+        work = _time_tasks(positions, board_size, split_lines(board_size, workers)) / one_pass
+        with DensityEngine(board_size, workers) as engine:
+            engine.density(*positions[0])  # warm up the pool
+            start = time.perf_counter()
+            results = [engine.density(board, counts) for board, counts in positions]
+            elapsed = (time.perf_counter() - start) / moves
+        if results != expected:
+            print("ERROR: Parallel counts differ from the in-process counts!")
+            return False
+        print(f"  {workers:2} workers : {elapsed * 1000:7.2f} ms per move (speed-up {serial / elapsed:.2f}x, "
+              f"total work {work:.2f}x serial)")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel placement-density computation")
+    parser.add_argument('--board-size', type=int, default=50)
+    parser.add_argument('--ships', type=int, nargs='*', default=None, help="Ship sizes (default: 40 ships of size 1-6)")
+    parser.add_argument('--workers', type=int, nargs='*', default=None, help="Worker counts to try")
+    parser.add_argument('--moves', type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.board_size, args.ships, args.workers, args.moves)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import argparse
+import json
+import os
+import socket
+import stat
+import threading
+import time
+from collections import deque
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from src.game_archive import RESULT_NAMES, result_code
+from src.utils import coord_to_str
+
+DROP = 'drop'    # a full buffer drops its oldest event
+BLOCK = 'block'  # a full buffer makes the publisher wait, at most block_timeout once, then drops
+
+
+class MoveEvent(NamedTuple):
+    """One resolved shot"""
+    game_id: str
+    turn: int
+    shooter: str          # 'player' or 'bot'
+    coord: str            # chess notation, e.g. 'A5'
+    result: str           # 'HIT', 'MISS' or 'HIT+DESTROYED'
+    ships_remaining: int  # ships the target side still has afloat
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict())
+
+    @classmethod
+    def from_json(cls, line: str) -> 'MoveEvent':
+        return cls(**json.loads(line))
+
+
+def move_event(game_id: str, game_state, is_player: bool, coord: Tuple[int, int], result: int) -> MoveEvent:
+    """Build the event for a move that GameState.process_move has just resolved"""
+    target_destroyed = game_state.bot_destroyed if is_player else game_state.player_destroyed
+    return MoveEvent(
+        game_id=str(game_id),
+        turn=game_state.turn,
+        shooter='player' if is_player else 'bot',
+        coord=coord_to_str(coord[0], coord[1]),
+        result=RESULT_NAMES[result],
+        ships_remaining=sum(1 for destroyed in target_destroyed if not destroyed),
+    )
+
+def move_events(game_id: str, game_state, is_player: bool, coords: List[Tuple[int, int]],
+                results: List[Tuple[bool, bool]]) -> List[MoveEvent]:
+    """
+    Build the events for the shots GameState.process_moves has just resolved.
+
+    The state only shows the fleet after the whole salvo, so each event
+    counts the ships left right after its own shot by adding back the ships
+    sunk by the shots that came after it.
+    """
+    events = [move_event(game_id, game_state, is_player, coord, result_code(is_hit, ship_destroyed))
+              for coord, (is_hit, ship_destroyed) in zip(coords, results)]
+    sunk_later = 0
+    for i in range(len(events) - 1, -1, -1):
+        events[i] = events[i]._replace(ships_remaining=events[i].ships_remaining + sunk_later)
+        sunk_later += results[i][1]
+    return events
+
+
+class Subscription:
+    """
+    A subscriber's bounded buffer of events.
+
+    The publisher only ever appends to this buffer; the subscriber drains it
+    at its own pace with get() or by iterating. When the buffer is full the
+    policy decides: DROP discards the oldest event straight away, BLOCK lets
+    the publisher wait up to `block_timeout` seconds for room before
+    dropping. A BLOCK subscriber that lets the timeout run out is marked
+    `lagging` and drops without waiting until it has drained half its
+    buffer, so a stuck subscriber costs the game one timeout, not one per
+    event. `dropped` counts lost events.
+    """
+
+    def __init__(self, bus: 'EventBus', maxsize: int, policy: str, block_timeout: float):
+        if policy not in (DROP, BLOCK):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self._bus = bus
+        self._events = deque()
+        self._condition = threading.Condition()
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.lagging = False
+        self.closed = False
+
+    def _offer(self, event: MoveEvent):
+        """Called by the publisher"""
+        with self._condition:
+            if len(self._events) >= self.maxsize and self.policy == BLOCK and not self.lagging:
+                self.lagging = not self._condition.wait_for(lambda: len(self._events) < self.maxsize or self.closed,
+                                                            timeout=self.block_timeout)
+            if len(self._events) >= self.maxsize:
+                self._events.popleft()
+                self.dropped += 1
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def get(self, timeout: float = None) -> Optional[MoveEvent]:
+        """Next event, or None on timeout or once the subscription is closed and drained"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._events or self.closed, timeout=timeout):
+                return None
+            if not self._events:
+                return None
+            event = self._events.popleft()
+            if self.lagging and len(self._events) <= self.maxsize // 2:
+                self.lagging = False
+            self._condition.notify_all()
+            return event
+
+    def __iter__(self) -> Iterator[MoveEvent]:
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self._bus._unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class EventBus:
+    """In-process publish/subscribe hub for per-move events"""
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, maxsize: int = 1024, policy: str = DROP, block_timeout: float = 0.05) -> Subscription:
+        subscription = Subscription(self, maxsize, policy, block_timeout)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, event: MoveEvent):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription._offer(event)
+
+    def close(self):
+        """End every subscription (their iterators stop once drained)"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+
+
+def _remove_stale_socket(path: str):
+    """Remove a socket left over from a previous run, but never one a running feed still serves"""
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(f"Another game is already publishing on {path}")
+
+
+class SocketFeed:
+    """
+    Serve a bus to other local processes over a Unix socket, one JSON line per event.
+
+    Every connection gets its own DROP subscription and a sender thread, so a
+    client that reads slowly (or not at all) only loses its own events.
+    Raises OSError if the socket cannot be created, e.g. when another feed
+    is still serving on `path`.
+    """
+
+    def __init__(self, bus: EventBus, path: str, maxsize: int = 1024):
+        self.bus = bus
+        self.path = path
+        self.maxsize = maxsize
+        self._subscriptions: List[Subscription] = []
+        self._senders: List[threading.Thread] = []
+        self._lock = threading.Lock()  # the lists are changed by the accept and sender threads
+        _remove_stale_socket(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._server.bind(path)
+            self._server.listen()
+        except OSError:
+            self._server.close()
+            raise
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return  # server closed
+            subscription = self.bus.subscribe(self.maxsize, DROP)
+            sender = threading.Thread(target=self._send_loop, args=(connection, subscription), daemon=True)
+            with self._lock:
+                self._subscriptions.append(subscription)
+                self._senders.append(sender)
+            sender.start()
+
+    def _send_loop(self, connection: socket.socket, subscription: Subscription):
+        try:
+            for event in subscription:
+                connection.sendall((event.to_json() + '\n').encode())
+        except OSError:
+            pass  # client went away
+        finally:
+            subscription.close()
+            connection.close()
+            with self._lock:  # forget the connection, so a long-running feed does not grow
+                self._subscriptions.remove(subscription)
+                self._senders.remove(threading.current_thread())
+
+    def close(self, timeout: float = 1.0):
+        """Stop accepting clients and give each connection up to `timeout` seconds to send what is buffered"""
+        self._server.close()
+        with self._lock:
+            subscriptions, senders = list(self._subscriptions), list(self._senders)
+        for subscription in subscriptions:
+            subscription.close()
+        for sender in senders:
+            sender.join(timeout)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def follow(path: str) -> Iterator[MoveEvent]:
+    """Connect to a SocketFeed and yield its events until the feed closes"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        with client.makefile('r') as lines:
+            for line in lines:
+                yield MoveEvent.from_json(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the moves of running games")
+    parser.add_argument('socket', nargs='?', default='data/events.sock', help="Event feed socket")
+    parser.add_argument('--test', action='store_true', help="Run the self-test instead")
+    args = parser.parse_args()
+
+    if args.test:
+        test_events()
+        return
+
+    try:
+        for event in follow(args.socket):
+            print(f"[{event.game_id}] turn {event.turn:3} {event.shooter:6} {event.coord:>3} "
+                  f"{event.result:13} ({event.ships_remaining} ships left)")
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"No game is publishing on {args.socket}")
+    except KeyboardInterrupt:
+        pass
+
+
+def test_events():
+    """Test the backpressure policies, salvo events and the socket feed"""
+    import tempfile
+
+    def event(turn: int) -> MoveEvent:
+        return MoveEvent('0', turn, 'player', 'A1', 'MISS', 10)
+
+    print("Testing event bus...")
+    bus = EventBus()
+    dropping = bus.subscribe(maxsize=3, policy=DROP)
+    blocking = bus.subscribe(maxsize=3, policy=BLOCK, block_timeout=0.05)
+    start = time.perf_counter()
+    for turn in range(20):
+        bus.publish(event(turn))
+    waited = time.perf_counter() - start
+    for subscription in (dropping, blocking):
+        if subscription.dropped != 17 or [subscription.get(0).turn for _ in range(3)] != [17, 18, 19]:
+            print(f"ERROR: {subscription.policy} subscription kept the wrong events!")
+            return False
+    if waited < 0.05:
+        print("ERROR: Publisher did not wait for the blocking subscriber!")
+        return False
+    if waited > 10 * 0.05:
+        print("ERROR: Publisher waited for a stuck subscriber on every event!")
+        return False
+    if blocking.lagging:
+        print("ERROR: A drained subscriber is still marked as lagging!")
+        return False
+
+    # A blocking subscriber that keeps up loses nothing
+    dropping.close()
+    blocking.block_timeout = 1.0
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(e.turn for e in blocking))
+    reader.start()
+    for turn in range(100):
+        bus.publish(event(turn))
+    bus.close()
+    reader.join()
+    if received != list(range(100)) or blocking.dropped != 17:
+        print("ERROR: Blocking subscriber lost events!")
+        return False
+
+    # Each shot of a salvo reports the ships left right after it
+    from src.gameplay import GameState
+    fleet = [[(2, 0), (2, 1)], [(0, 0)], [(0, 2)]]
+    game_state = GameState(fleet, fleet)
+    coords = [(0, 0), (5, 5), (0, 2)]
+    events = move_events('0', game_state, True, coords, game_state.process_moves(coords, True))
+    if [e.ships_remaining for e in events] != [2, 2, 1] or [e.result for e in events] != ['HIT+DESTROYED', 'MISS', 'HIT+DESTROYED']:
+        print("ERROR: Wrong ships remaining for the shots of a salvo!")
+        return False
+
+    if hasattr(socket, 'AF_UNIX'):
+        print("Testing socket feed...")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.sock')
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(path)
+            stale.close()  # left behind like after a crash
+
+            bus = EventBus()
+            feed = SocketFeed(bus, path)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(path)
+                deadline = time.perf_counter() + 5
+                while not feed._subscriptions and time.perf_counter() < deadline:
+                    time.sleep(0.01)  # the feed subscribes the connection on its accept thread
+                bus.publish(event(7))
+                with client.makefile('r') as lines:
+                    if MoveEvent.from_json(lines.readline()) != event(7):
+                        print("ERROR: Socket feed sent the wrong event!")
+                        return False
+
+            # A client that disconnects is forgotten once its sender notices
+            bus.publish(event(8))
+            deadline = time.perf_counter() + 5
+            while feed._senders and time.perf_counter() < deadline:
+                time.sleep(0.01)
+            if feed._subscriptions or feed._senders or bus._subscriptions:
+                print("ERROR: A disconnected client was not removed from the feed!")
+                return False
+
+            try:
+                SocketFeed(EventBus(), path)
+                print("ERROR: A second feed took over a live socket!")
+                return False
+            except OSError:
+                pass
+            feed.close()
+
+    print("All tests passed!")
+    return True
+
+if __name__ == "__main__":
+    main()
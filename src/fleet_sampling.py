@@ -0,0 +1,485 @@
+import gzip
+import os
+import random
+import struct
+import tempfile
+import zlib
+from bisect import bisect_right
+from functools import lru_cache
+from math import comb
+from typing import Dict, List, Optional, Tuple
+from src.utils import *
+
+# Cell status values stored in the DP profile (one entry per column):
+#   0       water
+#   k > 0   vertical (or still single) run of length k ending in this cell
+#   -1      ship cell that can no longer be extended (finished ship)
+#   -k      horizontal run of length k >= 2 ending in this cell (only ever
+#           seen in the cell directly to the left of the one being decided)
+EMPTY = 0
+FINISHED = -1
+
+CACHE_DIR = 'data/fleet_counts'
+CACHE_FORMAT = 2
+
+# Count table file (gzip): MAGIC, the configuration (CACHE_HEADER, ship sizes, ship
+# limits), then for each row boundary a profile count (u32) and per profile
+# its statuses (one signed byte per column) and its vector as length-prefixed
+# (u32) little-endian bytes. Plain data only, so a replaced file cannot run code.
+CACHE_MAGIC = b'BSFC'
+CACHE_HEADER = struct.Struct('<BBHB')  # format, board size, slot bits, number of ship sizes
+CACHE_COUNT = struct.Struct('<I')
+
+# Bounds of the per-counter sampling caches (profiles, and (row, profile, ships needed) triples)
+ROW_FILLINGS_CACHE = 1024
+ROW_OPTIONS_CACHE = 4096
+
+
+class FleetCounter:
+    """
+    Exact counter and uniform sampler of legal no-touch fleets.
+
+    A legal fleet is the same thing as a water/ship grid in which every
+    8-connected group of ship cells is a straight line, and the multiset of
+    line lengths equals the fleet.  The board is scanned cell by cell in
+    row-major order with a broken-profile DP whose state is the status of the
+    last cell decided in every column plus whether the cell up-left of the
+    current one is a ship cell.
+
+    The ships still to be placed are not part of the state.  Instead every
+    state maps "ships finished from here to the end of the board" to a number
+    of completions.  That map is a vector indexed by a mixed-radix number over
+    the ship sizes, packed into one big integer with a fixed number of bits
+    per entry, so adding vectors and shifting them by a finished ship are
+    single integer operations.
+
+    Only the vectors at row boundaries are kept; sampling walks the board row
+    by row and picks one of the possible fillings of each row.  Building them
+    takes a while for the standard fleet, so they are saved under `cache_dir`
+    (one file per configuration) and loaded by later processes.  For the
+    standard 10x10 fleet the loaded table takes about 130 MB per process;
+    the row caches used by sampling are bounded and add up to about 55 MB.
+    """
+
+    def __init__(self, board_size: int = BOARD_SIZE, ship_sizes: List[int] = SHIP_SIZES,
+                 cache_dir: Optional[str] = CACHE_DIR):
+        self.board_size = board_size
+        self.sizes = tuple(sorted(set(ship_sizes)))
+        self.limits = tuple(list(ship_sizes).count(size) for size in self.sizes)
+        self.max_size = max(self.sizes)
+
+        # Mixed-radix index of "how many ships of each size"
+        self.strides = []
+        stride = 1
+        for limit in self.limits:
+            self.strides.append(stride)
+            stride *= limit + 1
+        self.full_fleet = sum(limit * stride for limit, stride in zip(self.limits, self.strides))
+
+        # No partial count can exceed the number of ways to pick the ship cells
+        self.slot_bits = comb(board_size * board_size, sum(ship_sizes)).bit_length() + 1
+        self.slot_mask = (1 << self.slot_bits) - 1
+        self._fits_masks: Dict[int, int] = {}
+        self._within_cache: Dict[int, frozenset] = {}
+
+        self._rows: Optional[List[Dict[tuple, int]]] = None
+        self.cache_file = None
+        if cache_dir:
+            sizes = '-'.join(str(size) for size in sorted(ship_sizes))
+            self.cache_file = os.path.join(cache_dir, f"{board_size}x{board_size}_{sizes}.fc.gz")
+
+        # Per-instance caches, so a counter that is dropped takes them with it
+        self._row_fillings = lru_cache(maxsize=ROW_FILLINGS_CACHE)(self._list_row_fillings)
+        self._row_options = lru_cache(maxsize=ROW_OPTIONS_CACHE)(self._list_row_options)
+
+    def _digits(self, index: int) -> List[int]:
+        return [(index // stride) % (limit + 1) for stride, limit in zip(self.strides, self.limits)]
+
+    def _delta(self, finished: List[int]) -> Optional[int]:
+        """Index of a group of finished ship lengths, or None if they cannot belong to the fleet"""
+        delta = 0
+        matched = 0
+        for size, stride, limit in zip(self.sizes, self.strides, self.limits):
+            n = finished.count(size)
+            if n > limit:
+                return None
+            delta += n * stride
+            matched += n
+        return delta if matched == len(finished) else None
+
+    def _fits_mask(self, delta: int) -> int:
+        """Mask of the vector entries that stay inside the fleet after adding `delta`"""
+        mask = self._fits_masks.get(delta)
+        if mask is None:
+            extra = self._digits(delta)
+            mask = 0
+            for index in range(self.full_fleet + 1):
+                if all(d + e <= l for d, e, l in zip(self._digits(index), extra, self.limits)):
+                    mask |= self.slot_mask << (index * self.slot_bits)
+            self._fits_masks[delta] = mask
+        return mask
+
+    def _add(self, index: int, delta: int) -> Optional[int]:
+        """Add two fleet indices, or None if the result has too many ships of some size"""
+        if any(a + b > l for a, b, l in zip(self._digits(index), self._digits(delta), self.limits)):
+            return None
+        return index + delta
+
+    def _shift(self, vector: int, delta: int) -> int:
+        """Account for ships finished before `vector` starts"""
+        if delta == 0:
+            return vector
+        return (vector & self._fits_mask(delta)) << (delta * self.slot_bits)
+
+    def _entry(self, vector: int, index: int) -> int:
+        return (vector >> (index * self.slot_bits)) & self.slot_mask
+
+    def _transitions(self, col: int, state: tuple) -> List[Tuple[bool, tuple, int]]:
+        """List (is_ship, next_state, finished_delta) for both choices of the cell in `col`"""
+        profile, upleft = state
+        n = self.board_size
+        up = profile[col]
+        upright = profile[col + 1] if col + 1 < n else EMPTY
+        left = profile[col - 1] if col > 0 else EMPTY
+        next_upleft = up != EMPTY and col + 1 < n
+        result = []
+
+        # Water: closes a vertical run above and a horizontal run to the left
+        finished = []
+        if up > 0:
+            finished.append(up)
+        if left < FINISHED:
+            finished.append(-left)
+        delta = self._delta(finished)
+        if delta is not None:
+            new_profile = list(profile)
+            new_profile[col] = EMPTY
+            if left < FINISHED:
+                new_profile[col - 1] = FINISHED
+            result.append((False, (tuple(new_profile), next_upleft), delta))
+
+        # Ship cell: no diagonal neighbours, no corners, runs must stay straight
+        if upleft or upright != EMPTY or up < 0 or (up and left):
+            return result
+        new_profile = list(profile)
+        if up > 0:
+            status = up + 1
+        elif left == 1 or left < FINISHED:
+            status = -2 if left == 1 else left - 1
+            new_profile[col - 1] = FINISHED
+        elif left == EMPTY:
+            status = 1
+        else:
+            return result  # left is the bottom of a vertical run or a finished ship
+        if abs(status) > self.max_size:
+            return result
+
+        finished = []
+        if abs(status) == self.max_size or (col == n - 1 and status < FINISHED):
+            finished.append(abs(status))
+            status = FINISHED
+        delta = self._delta(finished)
+        if delta is not None:
+            new_profile[col] = status
+            result.append((True, (tuple(new_profile), next_upleft), delta))
+        return result
+
+    def _finish(self, profile: tuple) -> int:
+        """Vector for a completed board: close the vertical runs touching the bottom edge"""
+        delta = self._delta([status for status in profile if status > 0])
+        return 0 if delta is None else 1 << (delta * self.slot_bits)
+
+    def _canonical(self, profile: tuple) -> tuple:
+        """Rows below a boundary look the same from the left and the right: store one mirror image"""
+        mirrored = profile[::-1]
+        return mirrored if mirrored < profile else profile
+
+    def _build(self) -> List[Dict[tuple, int]]:
+        """Compute the completion vectors of every reachable profile at every row boundary"""
+        n = self.board_size
+
+        # Forward pass: which profiles can appear at each row boundary
+        boundaries = [{(EMPTY,) * n}]
+        for _ in range(n):
+            states = {(profile, False) for profile in boundaries[-1]}
+            for col in range(n):
+                states = {nxt for state in states for _, nxt, _ in self._transitions(col, state)}
+            boundaries.append({self._canonical(profile) for profile, _ in states})
+
+        # Backward pass, one row at a time, keeping only the boundary vectors
+        rows = [None] * (n + 1)
+        rows[n] = {profile: self._finish(profile) for profile in boundaries[n]}
+        for row in range(n - 1, -1, -1):
+            layers = [{(profile, False) for profile in boundaries[row]}]
+            for col in range(n - 1):
+                layers.append({nxt for state in layers[-1] for _, nxt, _ in self._transitions(col, state)})
+
+            below = {}
+            for col in range(n - 1, -1, -1):
+                current = {}
+                for state in layers[col]:
+                    vector = 0
+                    for _, nxt, delta in self._transitions(col, state):
+                        if col == n - 1:
+                            child = rows[row + 1].get(self._canonical(nxt[0]))
+                        else:
+                            child = below.get(nxt)
+                        if child:
+                            vector += self._shift(child, delta)
+                    current[state] = vector
+                below = current
+            rows[row] = {profile: vector for (profile, _), vector in below.items() if vector}
+
+        return rows
+
+    def _cache_header(self) -> bytes:
+        return (CACHE_MAGIC + CACHE_HEADER.pack(CACHE_FORMAT, self.board_size, self.slot_bits, len(self.sizes))
+                + bytes(self.sizes) + bytes(self.limits))
+
+    def _load_rows(self) -> Optional[List[Dict[tuple, int]]]:
+        """The saved boundary vectors, or None if there are none for this configuration"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        header = self._cache_header()
+        entry = struct.Struct(f'<{self.board_size}bI')  # profile statuses, vector length
+        rows = []
+        try:
+            with gzip.open(self.cache_file, 'rb') as f:  # streamed, so the file is never in memory whole
+                if f.read(len(header)) != header:
+                    return None
+                for _ in range(self.board_size + 1):
+                    (count,) = CACHE_COUNT.unpack(f.read(CACHE_COUNT.size))
+                    row = {}
+                    for _ in range(count):
+                        *profile, length = entry.unpack(f.read(entry.size))
+                        data = f.read(length)
+                        if len(data) != length:
+                            return None
+                        row[tuple(profile)] = int.from_bytes(data, 'little')
+                    rows.append(row)
+                if f.read(1):
+                    return None
+        except (OSError, EOFError, zlib.error, struct.error):
+            return None
+        return rows
+
+    def _save_rows(self, rows: List[Dict[tuple, int]]):
+        """Save the boundary vectors; another process may be writing the same file, so replace it atomically"""
+        if not self.cache_file:
+            return
+        temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+            entry = struct.Struct(f'<{self.board_size}bI')
+            with gzip.open(temp_file, 'wb', compresslevel=6) as f:
+                f.write(self._cache_header())
+                for row in rows:
+                    f.write(CACHE_COUNT.pack(len(row)))
+                    for profile, vector in row.items():
+                        data = vector.to_bytes((vector.bit_length() + 7) // 8, 'little')
+                        f.write(entry.pack(*profile, len(data)))
+                        f.write(data)
+            os.replace(temp_file, self.cache_file)
+        except OSError:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def _boundary_rows(self) -> List[Dict[tuple, int]]:
+        if self._rows is None:
+            self._rows = self._load_rows()
+            if self._rows is None:
+                self._rows = self._build()
+                self._save_rows(self._rows)
+        return self._rows
+
+    def _within(self, index: int) -> frozenset:
+        """Fleet indices with no more ships of any size than `index`"""
+        within = self._within_cache.get(index)
+        if within is None:
+            limits = self._digits(index)
+            within = frozenset(
+                i for i in range(index + 1)
+                if all(d <= l for d, l in zip(self._digits(i), limits))
+            )
+            self._within_cache[index] = within
+        return within
+
+    def _list_row_fillings(self, profile: tuple) -> List[Tuple[Tuple[int, ...], tuple, tuple, int]]:
+        """
+        Every legal way to fill the row below `profile`:
+        (ship columns, next profile, its stored mirror image, finished delta)
+        """
+        fillings = [((), (profile, False), 0)]
+        for col in range(self.board_size):
+            extended = []
+            for cols, state, total in fillings:
+                for is_ship, nxt, delta in self._transitions(col, state):
+                    total_delta = self._add(total, delta) if delta else total
+                    if total_delta is not None:
+                        extended.append((cols + (col,) if is_ship else cols, nxt, total_delta))
+            fillings = extended
+        return [(cols, nxt, self._canonical(nxt), delta) for cols, (nxt, _), delta in fillings]
+
+    def _list_row_options(self, row: int, profile: tuple, needed: int) -> Tuple[List[int], List[int]]:
+        """Cumulative weights and positions in _row_fillings(profile) of the fillings of `row` that can complete the fleet"""
+        within = self._within(needed)
+        completions = self._boundary_rows()[row + 1].get
+        bits = self.slot_bits
+        mask = self.slot_mask
+        cumulative = []
+        positions = []
+        total = 0
+        for position, (_, _, key, delta) in enumerate(self._row_fillings(profile)):
+            if delta in within:
+                weight = (completions(key, 0) >> ((needed - delta) * bits)) & mask
+                if weight:
+                    total += weight
+                    cumulative.append(total)
+                    positions.append(position)
+        return cumulative, positions
+
+    def count(self) -> int:
+        """Total number of legal fleets for this configuration"""
+        vector = self._boundary_rows()[0].get((EMPTY,) * self.board_size, 0)
+        return self._entry(vector, self.full_fleet)
+
+    def sample(self, rng: random.Random = None) -> List[List[Tuple[int, int]]]:
+        """Draw one fleet uniformly at random among all legal fleets"""
+        rng = rng or random
+        if self.count() == 0:
+            raise ValueError("No legal fleet exists for this board and fleet configuration")
+
+        profile = (EMPTY,) * self.board_size
+        needed = self.full_fleet
+        ship_cells = set()
+
+        for row in range(self.board_size):
+            cumulative, positions = self._row_options(row, profile, needed)
+            position = positions[bisect_right(cumulative, rng.randrange(cumulative[-1]))]
+            cols, profile, _, delta = self._row_fillings(profile)[position]
+            ship_cells.update((row, col) for col in cols)
+            needed -= delta
+
+        return cells_to_ships(ship_cells)
+
+
+def cells_to_ships(ship_cells) -> List[List[Tuple[int, int]]]:
+    """Split a set of no-touch ship cells into ships, largest first"""
+    ships = []
+    remaining = set(ship_cells)
+    while remaining:
+        start = min(remaining)
+        ship = [start]
+        for dr, dc in ((0, 1), (1, 0)):
+            r, c = start[0] + dr, start[1] + dc
+            while (r, c) in remaining:
+                ship.append((r, c))
+                r, c = r + dr, c + dc
+        remaining.difference_update(ship)
+        ships.append(ship)
+    ships.sort(key=len, reverse=True)
+    return ships
+
+
+_counters: Dict[Tuple[int, Tuple[int, ...]], FleetCounter] = {}
+
+def get_fleet_counter(board_size: int = BOARD_SIZE, ship_sizes: List[int] = SHIP_SIZES) -> FleetCounter:
+    """Return the cached counter for a board and fleet configuration"""
+    key = (board_size, tuple(sorted(ship_sizes)))
+    if key not in _counters:
+        _counters[key] = FleetCounter(board_size, ship_sizes)
+    return _counters[key]
+
+def count_fleets(board_size: int = BOARD_SIZE, ship_sizes: List[int] = SHIP_SIZES) -> int:
+    """Count legal no-touch fleets exactly"""
+    return get_fleet_counter(board_size, ship_sizes).count()
+
+def sample_fleet(board_size: int = BOARD_SIZE, ship_sizes: List[int] = SHIP_SIZES,
+                 rng: random.Random = None) -> List[List[Tuple[int, int]]]:
+    """Sample a legal no-touch fleet uniformly at random"""
+    return get_fleet_counter(board_size, ship_sizes).sample(rng)
+
+
+def _brute_force_count(board_size: int, ship_sizes: List[int]) -> int:
+    """Count fleets by enumerating placements (only usable on tiny boards)"""
+    placements = {}
+    for size in set(ship_sizes):
+        options = []
+        for row in range(board_size):
+            for col in range(board_size):
+                if col + size <= board_size:
+                    options.append(frozenset((row, col + i) for i in range(size)))
+                if size > 1 and row + size <= board_size:
+                    options.append(frozenset((row + i, col) for i in range(size)))
+        placements[size] = options
+
+    fleets = set()
+    order = sorted(ship_sizes, reverse=True)
+
+    def place(i, ships):
+        if i == len(order):
+            fleets.add(frozenset(ships))
+            return
+        for ship in placements[order[i]]:
+            if all(not (ship & s) for s in ships) and not ships_touch(set(ship), [set(s) for s in ships]):
+                place(i + 1, ships + [ship])
+
+    place(0, [])
+    return len(fleets)
+
+def test_fleet_sampling():
+    """Test fleet counting against brute force and check sampled fleets"""
+    print("Testing fleet counting...")
+    for board_size, ship_sizes in [(3, [2, 1]), (4, [2, 1, 1]), (5, [3, 2, 1, 1]), (5, [4, 2, 1]), (6, [4, 2, 2, 1])]:
+        expected = _brute_force_count(board_size, ship_sizes)
+        counted = FleetCounter(board_size, ship_sizes, cache_dir=None).count()
+        print(f"  {board_size}x{board_size} {ship_sizes}: {counted} fleets")
+        if counted != expected:
+            print(f"ERROR: expected {expected} fleets")
+            return False
+
+    print("Testing uniform sampling...")
+    rng = random.Random(0)
+    counter = FleetCounter(3, [2, 1], cache_dir=None)
+    seen = {}
+    for _ in range(6000):
+        fleet = frozenset(frozenset(s) for s in counter.sample(rng))
+        seen[fleet] = seen.get(fleet, 0) + 1
+    if len(seen) != counter.count() or max(seen.values()) > 2 * min(seen.values()):
+        print("ERROR: Sampling is not uniform!")
+        return False
+
+    print("Testing the saved count table...")
+    with tempfile.TemporaryDirectory() as tmp:
+        built = FleetCounter(6, [4, 2, 2, 1], cache_dir=tmp)
+        built.count()
+        loaded = FleetCounter(6, [4, 2, 2, 1], cache_dir=tmp)
+        if loaded._load_rows() != built._boundary_rows() or loaded.count() != built.count():
+            print("ERROR: Saved count table differs!")
+            return False
+        if FleetCounter(6, [4, 2, 1, 1], cache_dir=tmp)._load_rows() is not None:
+            print("ERROR: Count table loaded for another fleet!")
+            return False
+        with open(loaded.cache_file, 'r+b') as f:
+            f.truncate(os.path.getsize(loaded.cache_file) // 2)
+        if FleetCounter(6, [4, 2, 2, 1], cache_dir=tmp)._load_rows() is not None:
+            print("ERROR: Truncated count table was loaded!")
+            return False
+
+    print(f"Standard fleets on {BOARD_SIZE}x{BOARD_SIZE}: {count_fleets()}")
+    for _ in range(20):
+        ships = sample_fleet(rng=rng)
+        if sorted(len(s) for s in ships) != sorted(SHIP_SIZES):
+            print("ERROR: Wrong fleet composition!")
+            return False
+        for i, ship in enumerate(ships):
+            others = [set(s) for j, s in enumerate(ships) if j != i]
+            if ships_touch(set(ship), others):
+                print("ERROR: Ships touching!")
+                return False
+
+    print("All tests passed!")
+    return True
+
+if __name__ == "__main__":
+    test_fleet_sampling()
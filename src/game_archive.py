@@ -0,0 +1,410 @@
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Tuple
+from src.utils import *
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so only one writer at a time
+    fcntl = None
+
+# Archive layout
+#
+#   <name>        header, then one record per game, back to back
+#   <name>.idx    one little-endian u64 per committed game: its record offset
+#
+# Header:  b'BSGA', version (u8), board size (u8), 2 reserved bytes
+# Record:  move count (u16, high bit set for a salvo-rules game),
+#          player ship count (u8), bot ship count (u8)
+#          2 bytes per ship, player fleet then bot fleet:
+#              first cell index (row * board_size + col), size | 0x80 if vertical
+#          1 byte per move: cell index | 0x80 if the bot fired
+#          2 outcome bits per move, 4 moves per byte (0 MISS, 1 HIT, 2 HIT+DESTROYED)
+#
+# The index file is the commit point: a game exists only once its offset is
+# in the index, and the index is only written after the records it points to
+# are on disk. Anything past the last committed record is discarded on open.
+# If the index is missing altogether (e.g. the archive was copied without it)
+# it is rebuilt by walking the records, which carry their own length.
+#
+# Several processes may write the same archive (a game and a simulation run
+# both use data/games.bsa): every writer holds an exclusive lock on the
+# index while it recovers or commits, and re-reads the committed count and
+# end from the index under that lock before writing.
+MAGIC = b'BSGA'
+VERSION = 1
+HEADER = struct.Struct('<4sBB2x')
+RECORD_HEADER = struct.Struct('<HBB')
+OFFSET = struct.Struct('<Q')
+SALVO_FLAG = 0x8000  # in the move count
+
+MISS, HIT, HIT_DESTROYED = 0, 1, 2
+RESULT_NAMES = ['MISS', 'HIT', 'HIT+DESTROYED']
+
+Move = Tuple[bool, Tuple[int, int], int]  # (is_player, coord, result)
+
+
+def result_code(is_hit: bool, ship_destroyed: bool) -> int:
+    """Outcome code for a (is_hit, ship_destroyed) pair from GameState.process_move"""
+    return HIT_DESTROYED if ship_destroyed else HIT if is_hit else MISS
+
+
+def _pack_fleet(ships: List[List[Tuple[int, int]]], board_size: int) -> bytes:
+    packed = bytearray()
+    for ship in ships:
+        row, col = min(ship)
+        vertical = len(ship) > 1 and len({r for r, _ in ship}) > 1
+        packed.append(row * board_size + col)
+        packed.append(len(ship) | (0x80 if vertical else 0))
+    return bytes(packed)
+
+def _unpack_fleet(data, board_size: int) -> List[List[Tuple[int, int]]]:
+    ships = []
+    for i in range(0, len(data), 2):
+        row, col = divmod(data[i], board_size)
+        size, vertical = data[i + 1] & 0x7F, data[i + 1] & 0x80
+        ships.append([(row + k, col) if vertical else (row, col + k) for k in range(size)])
+    return ships
+
+def pack_game(player_ships, bot_ships, moves: List[Move], board_size: int = BOARD_SIZE,
+              salvo: bool = False) -> bytes:
+    """Encode one game as an archive record; `salvo` marks a game played with salvo rules"""
+    move_bytes = bytearray()
+    outcome_bytes = bytearray((len(moves) + 3) // 4)
+    for i, (is_player, (row, col), result) in enumerate(moves):
+        move_bytes.append(row * board_size + col | (0 if is_player else 0x80))
+        outcome_bytes[i // 4] |= result << (2 * (i % 4))
+
+    return (RECORD_HEADER.pack(len(moves) | (SALVO_FLAG if salvo else 0), len(player_ships), len(bot_ships))
+            + _pack_fleet(player_ships, board_size) + _pack_fleet(bot_ships, board_size)
+            + bytes(move_bytes) + bytes(outcome_bytes))
+
+def record_length(buffer, offset: int) -> int:
+    """Size in bytes of the record starting at `offset`"""
+    n_moves, n_player, n_bot = RECORD_HEADER.unpack_from(buffer, offset)
+    n_moves &= ~SALVO_FLAG
+    return RECORD_HEADER.size + 2 * (n_player + n_bot) + n_moves + (n_moves + 3) // 4
+
+
+class GameRecord(NamedTuple):
+    """
+    One archived game; `moves` and `outcomes` are zero-copy views into the archive.
+
+    Sides take turns, so a turn is a run of consecutive moves by one side:
+    a single move, or a whole salvo when `salvo` is set.
+    """
+    player_ships: List[List[Tuple[int, int]]]
+    bot_ships: List[List[Tuple[int, int]]]
+    moves: memoryview
+    outcomes: memoryview
+    board_size: int
+    salvo: bool = False
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def move(self, i: int) -> Move:
+        """Decode move i as (is_player, coord, result)"""
+        byte = self.moves[i]
+        result = (self.outcomes[i // 4] >> (2 * (i % 4))) & 0b11
+        return not byte & 0x80, divmod(byte & 0x7F, self.board_size), result
+
+    def iter_moves(self) -> Iterator[Move]:
+        for i in range(len(self.moves)):
+            yield self.move(i)
+
+
+class GameArchiveWriter:
+    """
+    Append games to an archive, committing them in groups.
+
+    Games are buffered in memory and written `group_size` at a time with one
+    fsync of the records followed by one fsync of the index, so the cost of
+    durability is shared by the whole group. Call close() (or use the writer
+    as a context manager) to commit the last partial group. Other writers
+    may commit in between, so a game's number is only final once its group
+    is committed; `count` is then the number of games in the archive.
+    """
+
+    def __init__(self, filename: str, group_size: int = 256, board_size: int = BOARD_SIZE):
+        if board_size * board_size > 0x80:
+            raise ValueError("Cell indices must fit in 7 bits (boards up to 11x11)")
+        self.filename = filename
+        self.group_size = group_size
+        self.board_size = board_size
+        self._pending: List[bytes] = []
+
+        index_missing = not os.path.exists(filename + '.idx')
+        self._index = os.fdopen(os.open(filename + '.idx', os.O_RDWR | os.O_CREAT, 0o666), 'r+b')
+        try:
+            with self._locked():
+                if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+                    self._create()
+                    index_missing = True
+                self._data = open(filename, 'r+b')
+                self._recover(index_missing)
+        except BaseException:
+            self._index.close()
+            raise
+
+    @contextmanager
+    def _locked(self):
+        """Hold the archive's writer lock (an exclusive lock on the index file)"""
+        if fcntl:
+            fcntl.flock(self._index.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(self._index.fileno(), fcntl.LOCK_UN)
+
+    def _create(self):
+        """Write a new, empty archive; the header goes to a temp file first so a crash never leaves a headerless one"""
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.board_size))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+
+    def _recover(self, rebuild_index: bool = False):
+        """Drop a torn index entry and any record bytes that were never committed"""
+        self._data.seek(0)
+        magic, version, board_size = HEADER.unpack(self._data.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.filename} is not a version {VERSION} game archive")
+        if board_size != self.board_size:
+            raise ValueError(f"{self.filename} stores {board_size}x{board_size} games, not {self.board_size}x{self.board_size}")
+        if rebuild_index:
+            self._rebuild_index()
+
+        self._read_index()
+        self._index.truncate(self.count * OFFSET.size)
+        self._data.truncate(self._end)
+
+    def _read_index(self):
+        """Set `count` and the end of the last committed record from the index"""
+        self.count = os.fstat(self._index.fileno()).st_size // OFFSET.size
+        end = HEADER.size
+        if self.count:
+            self._index.seek((self.count - 1) * OFFSET.size)
+            (last,) = OFFSET.unpack(self._index.read(OFFSET.size))
+            self._data.seek(last)
+            header = self._data.read(RECORD_HEADER.size)
+            end = last + record_length(header, 0)
+        self._end = end
+
+    def _rebuild_index(self):
+        """Index every whole record in the data file; only a torn last record is left out"""
+        size = os.fstat(self._data.fileno()).st_size
+        offsets = bytearray()
+        offset = HEADER.size
+        while offset + RECORD_HEADER.size <= size:
+            self._data.seek(offset)
+            end = offset + record_length(self._data.read(RECORD_HEADER.size), 0)
+            if end > size:
+                break
+            offsets += OFFSET.pack(offset)
+            offset = end
+        self._index.seek(0)
+        self._index.truncate()
+        self._index.write(offsets)
+        self._index.flush()
+        os.fsync(self._index.fileno())
+
+    def append(self, player_ships, bot_ships, moves: List[Move], salvo: bool = False) -> int:
+        """Queue one game and return its expected game number (final once committed, see the class docstring)"""
+        self._pending.append(pack_game(player_ships, bot_ships, moves, self.board_size, salvo))
+        game_id = self.count + len(self._pending) - 1
+        if len(self._pending) >= self.group_size:
+            self.commit()
+        return game_id
+
+    def commit(self):
+        """Make every queued game durable and visible to readers"""
+        if not self._pending:
+            return
+
+        with self._locked():
+            self._read_index()  # other writers may have committed since we last looked
+            offsets = bytearray()
+            self._data.seek(self._end)
+            for record in self._pending:
+                offsets += OFFSET.pack(self._end)
+                self._data.write(record)
+                self._end += len(record)
+            self._data.flush()
+            os.fsync(self._data.fileno())
+
+            self._index.seek(self.count * OFFSET.size)
+            self._index.write(offsets)
+            self._index.flush()
+            os.fsync(self._index.fileno())
+
+            self.count += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        self.commit()
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameArchive:
+    """Read-only, memory-mapped view of an archive; game N is found in O(1) through the index"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._data_file = open(filename, 'rb')
+        self._index_file = open(filename + '.idx', 'rb')
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.board_size = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a version {VERSION} game archive")
+
+        # Only whole index entries count; an empty index cannot be mapped
+        self.count = os.path.getsize(filename + '.idx') // OFFSET.size
+        self._index = (mmap.mmap(self._index_file.fileno(), self.count * OFFSET.size, access=mmap.ACCESS_READ)
+                       if self.count else b'')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def offset(self, n: int) -> int:
+        (offset,) = OFFSET.unpack_from(self._index, n * OFFSET.size)
+        return offset
+
+    def __getitem__(self, n: int) -> GameRecord:
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError(f"game {n} is not in the archive")
+
+        offset = self.offset(n)
+        n_moves, n_player, n_bot = RECORD_HEADER.unpack_from(self._data, offset)
+        salvo = bool(n_moves & SALVO_FLAG)
+        n_moves &= ~SALVO_FLAG
+        view = memoryview(self._data)
+        pos = offset + RECORD_HEADER.size
+        player_ships = _unpack_fleet(view[pos:pos + 2 * n_player], self.board_size)
+        pos += 2 * n_player
+        bot_ships = _unpack_fleet(view[pos:pos + 2 * n_bot], self.board_size)
+        pos += 2 * n_bot
+        moves = view[pos:pos + n_moves]
+        pos += n_moves
+        outcomes = view[pos:pos + (n_moves + 3) // 4]
+        return GameRecord(player_ships, bot_ships, moves, outcomes, self.board_size, salvo)
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for n in range(self.count):
+            yield self[n]
+
+    def close(self):
+        try:
+            if self.count:
+                self._index.close()
+            self._data.close()
+        except BufferError:
+            pass  # records still reference the maps; they are unmapped once released
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def test_archive():
+    """Test round-tripping games and recovering from a torn append or a lost index"""
+    import random
+    import tempfile
+    from src.bot_generation import generate_bot_ships
+
+    print("Testing game archive...")
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'games.bsa')
+        games = []
+        with GameArchiveWriter(filename, group_size=7) as writer:
+            for _ in range(50):
+                cells = [(r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)]
+                random.shuffle(cells)
+                moves = [(random.random() < 0.5, cell, random.randrange(3)) for cell in cells[:random.randrange(120)]]
+                game = (generate_bot_ships(), generate_bot_ships(), moves, random.random() < 0.5)
+                writer.append(*game)
+                games.append(game)
+
+        # Simulate a crash in the middle of the next group commit
+        size = os.path.getsize(filename)
+        with open(filename, 'ab') as f:
+            f.write(b'\x10\x00torn record')
+        with open(filename + '.idx', 'ab') as f:
+            f.write(OFFSET.pack(size)[:5])
+
+        with GameArchiveWriter(filename) as writer:
+            if writer.count != len(games) or os.path.getsize(filename) != size:
+                print("ERROR: Uncommitted data was not discarded!")
+                return False
+
+        # An archive copied without its index keeps its games
+        os.remove(filename + '.idx')
+        with open(filename, 'ab') as f:
+            f.write(b'\x10\x00torn record')
+        with GameArchiveWriter(filename) as writer:
+            if writer.count != len(games) or os.path.getsize(filename) != size:
+                print("ERROR: Index was not rebuilt from the records!")
+                return False
+
+        with GameArchive(filename) as archive:
+            if len(archive) != len(games):
+                print("ERROR: Wrong number of games!")
+                return False
+            for record, (player_ships, bot_ships, moves, salvo) in zip(archive, games):
+                if (sorted(map(sorted, record.player_ships)) != sorted(map(sorted, player_ships))
+                        or sorted(map(sorted, record.bot_ships)) != sorted(map(sorted, bot_ships))
+                        or list(record.iter_moves()) != moves or record.salvo != salvo):
+                    print("ERROR: Game did not round-trip!")
+                    return False
+            del record
+
+        print(f"{len(games)} games in {size} bytes ({size / len(games):.0f} bytes per game)")
+
+        # Two writers on one archive, committing in turn, both keep their games
+        shared = os.path.join(tmp, 'shared.bsa')
+        first, second = GameArchiveWriter(shared, group_size=3), GameArchiveWriter(shared, group_size=2)
+        for n in range(12):
+            writer = first if n % 3 else second
+            writer.append(*games[n])
+        first.close()
+        second.close()
+        with GameArchive(shared) as archive:
+            written = sorted(list(game.moves) for game in archive)
+            del game
+        if written != sorted([row * BOARD_SIZE + col | (0 if is_player else 0x80) for is_player, (row, col), _ in moves]
+                             for _, _, moves, _ in games[:12]):
+            print("ERROR: Interleaved writers lost or overwrote games!")
+            return False
+
+        # An archive left empty by a crash before its header was written is started afresh
+        empty = os.path.join(tmp, 'empty.bsa')
+        open(empty, 'wb').close()
+        with GameArchiveWriter(empty) as writer:
+            writer.append(*games[0])
+        if writer.count != 1:
+            print("ERROR: An empty archive file was not recreated!")
+            return False
+
+    print("All tests passed!")
+    return True
+
+if __name__ == "__main__":
+    test_archive()
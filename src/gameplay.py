@@ -1,31 +1,260 @@
 import csv
 import random
+import time
+from array import array
+from functools import lru_cache
 from typing import List, Set, Tuple, Optional
 from src.utils import *
+from src.density import UNKNOWN, BLOCKED, HIT, compute_density, pick_densest_cell
+
+BOT_MODES = ['classic', 'density', 'learned']
+SALVO_SHIPS = 0  # salvo size meaning "one shot per own ship still afloat"
+
+class BoardConfig:
+    """
+    Everything about a board that is the same in every game: the (row, col)
+    tuple of each cell index, the index of each tuple, the bitmask of each
+    cell with its 8 neighbours, and the initial untried-cell layout. It never
+    changes, so every session on a board of the same size shares one
+    instance (see get_board_config). Cell indices are stored in a byte up
+    to 16x16 and in two bytes on larger boards.
+    """
+    __slots__ = ('size', 'cells', 'coords', 'index', 'neighbourhood', 'even_cells', 'untried_template')
+    
+    def __init__(self, board_size: int):
+        self.size = board_size
+        self.cells = board_size * board_size
+        self.coords = tuple(divmod(cell, board_size) for cell in range(self.cells))
+        self.index = {coord: cell for cell, coord in enumerate(self.coords)}
+        self.neighbourhood = tuple(
+            sum(1 << self.index[(r, c)] for r in range(row - 1, row + 2) for c in range(col - 1, col + 2)
+                if (r, c) in self.index)
+            for row, col in self.coords
+        )
+        
+        # UntriedCells layout: even-colour cells, odd-colour cells, then each cell's position
+        even = [cell for cell in range(self.cells) if sum(self.coords[cell]) % 2 == 0]
+        odd = [cell for cell in range(self.cells) if sum(self.coords[cell]) % 2 == 1]
+        self.even_cells = len(even)
+        position = [0] * self.cells
+        for i, cell in enumerate(even + odd):
+            position[cell] = i
+        self.untried_template = bytearray(even + odd + position) if self.cells <= 256 else array('H', even + odd + position)
+
+@lru_cache(maxsize=None)
+def get_board_config(board_size: int = BOARD_SIZE) -> BoardConfig:
+    return BoardConfig(board_size)
+
+
+def _bits(mask: int):
+    """Cell indices set in a bitmask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class UntriedCells:
+    """
+    The cells a side has not fired at (or seen marked) yet, split by checkerboard colour.
+    
+    Each colour keeps its cells in a region of one array and every cell
+    remembers its position there, so a cell is removed by moving the last
+    cell of its colour into its slot, and a uniform random cell is one index
+    away: both take the same time on the first move as on the last.
+    """
+    __slots__ = ('config', '_data', '_even', '_odd')
+    
+    def __init__(self, board_size: int = BOARD_SIZE):
+        self.config = get_board_config(board_size)
+        self._data = self.config.untried_template[:]  # cells by colour, then positions
+        self._even = self.config.even_cells
+        self._odd = self.config.cells - self._even
+    
+    def __len__(self) -> int:
+        return self._even + self._odd
+    
+    def __contains__(self, coord: Tuple[int, int]) -> bool:
+        row, col = coord
+        cell = row * self.config.size + col
+        position = self._data[self.config.cells + cell]
+        if (row + col) % 2:
+            inside = self.config.even_cells <= position < self.config.even_cells + self._odd
+        else:
+            inside = position < self._even
+        return inside and self._data[position] == cell
+    
+    def __iter__(self):
+        for start, count in ((0, self._even), (self.config.even_cells, self._odd)):
+            for cell in self._data[start:start + count]:
+                yield self.config.coords[cell]
+    
+    def remove(self, coord: Tuple[int, int]):
+        """Take a cell out; cells already removed are ignored"""
+        row, col = coord
+        config = self.config
+        data = self._data
+        cell = row * config.size + col
+        position = data[config.cells + cell]
+        if (row + col) % 2:
+            if not config.even_cells <= position < config.even_cells + self._odd or data[position] != cell:
+                return
+            self._odd -= 1
+            last_position = config.even_cells + self._odd
+        else:
+            if position >= self._even or data[position] != cell:
+                return
+            self._even -= 1
+            last_position = self._even
+        last = data[last_position]
+        data[position] = last
+        data[self.config.cells + last] = position
+    
+    def remove_mask(self, mask: int):
+        """Take out every cell set in a bitmask; cells already removed are ignored"""
+        data = self._data
+        cells = self.config.cells
+        even_cells = self.config.even_cells
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            cell = low.bit_length() - 1
+            position = data[cells + cell]
+            if position >= even_cells:  # a cell never leaves the region of its colour
+                if position >= even_cells + self._odd or data[position] != cell:
+                    continue
+                self._odd -= 1
+                last_position = even_cells + self._odd
+            else:
+                if position >= self._even or data[position] != cell:
+                    continue
+                self._even -= 1
+                last_position = self._even
+            last = data[last_position]
+            data[position] = last
+            data[cells + last] = position
+    
+    def count(self, parity: int) -> int:
+        """Cells left of one checkerboard colour ((row + col) % 2 == parity)"""
+        return self._odd if parity else self._even
+    
+    def sample(self, parity: int = None) -> Tuple[int, int]:
+        """A uniformly random cell, of one checkerboard colour if `parity` is given"""
+        if parity is None:
+            index = random.randrange(len(self))
+            position = index if index < self._even else self.config.even_cells + index - self._even
+        elif parity:
+            position = self.config.even_cells + random.randrange(self._odd)
+        else:
+            position = random.randrange(self._even)
+        return self.config.coords[self._data[position]]
+
 
 class GameState:
-    def __init__(self, player_ships: List[List[Tuple[int, int]]], bot_ships: List[List[Tuple[int, int]]]):
-        # Convert to sets for easier checking
-        self.player_ships = [set(ship) for ship in player_ships]
-        self.bot_ships = [set(ship) for ship in bot_ships]
+    """
+    One game in progress.
+    
+    A session is kept small so that a server can hold many of them: the
+    board geometry lives in a shared BoardConfig, each fleet is a packed
+    byte per cell (ship number, 0 for water), hits, misses and sunk ships
+    are integer bitmasks, and the attributes are slotted. The ship, hit,
+    miss and destroyed collections of the original interface are still
+    available as read-only properties.
+    """
+    __slots__ = ('config', '_player_fleet', '_bot_fleet', '_player_ship_count', '_bot_ship_count',
+                 '_player_hits', '_player_misses', '_bot_hits', '_bot_misses', '_player_sunk', '_bot_sunk',
+                 'turn', 'bot_mode', 'density_engine', 'policy', 'bot_target_mode', 'bot_current_target',
+                 'bot_direction', 'bot_untried', 'parity_hunting')
+    
+    def __init__(self, player_ships: List[List[Tuple[int, int]]], bot_ships: List[List[Tuple[int, int]]],
+                 bot_mode: str = 'classic', parity_hunting: bool = False):
+        self.config = get_board_config(BOARD_SIZE)
+        
+        # Cell -> ship number (index + 1, 0 for water), for resolving any shot with one lookup
+        self._player_fleet = self._pack_fleet(player_ships)
+        self._bot_fleet = self._pack_fleet(bot_ships)
+        self._player_ship_count = len(player_ships)
+        self._bot_ship_count = len(bot_ships)
         
-        # Track hits and misses
-        self.player_hits = set()
-        self.player_misses = set()
-        self.bot_hits = set()
-        self.bot_misses = set()
+        # Track hits and misses (bit i set = cell i); "player" hits and misses are on the bot's board
+        self._player_hits = 0
+        self._player_misses = 0
+        self._bot_hits = 0
+        self._bot_misses = 0
         
-        # Track destroyed ships
-        self.player_destroyed = [False] * len(player_ships)
-        self.bot_destroyed = [False] * len(bot_ships)
+        # Track destroyed ships (bit i set = ship i sunk)
+        self._player_sunk = 0
+        self._bot_sunk = 0
         
         self.turn = 0
         
         # Bot AI state
+        self.bot_mode = bot_mode  # 'classic' (hunt/target rules), 'density' (placement heatmap) or 'learned' (trained model)
+        self.density_engine = None  # optional src.density.DensityEngine to spread the heatmap over cores
+        self.policy = None  # src.learned_policy.TargetingPolicy for 'learned', loaded from the default file if unset
         self.bot_target_mode = False
-        self.bot_current_target = []  # List of hits on current ship
+        self.bot_current_target = ()  # Hits on current ship
         self.bot_direction = None  # 'horizontal' or 'vertical'
-        self.bot_tried_cells = set()
+        self.bot_untried = UntriedCells()  # player board cells the bot has not shot at or seen marked
+        self.parity_hunting = parity_hunting  # hunt on one checkerboard colour once every 1-cell ship is sunk
+        if bot_mode == 'learned':
+            self._get_policy()  # load the weights now rather than on the bot's first move
+    
+    def _pack_fleet(self, ships) -> bytes:
+        if len(ships) > 255:
+            raise ValueError("A fleet can have at most 255 ships")
+        fleet = bytearray(self.config.cells)
+        for number, ship in enumerate(ships, 1):
+            for row, col in ship:
+                fleet[row * self.config.size + col] = number
+        return bytes(fleet)
+    
+    def _ship_cells(self, fleet: bytes, number: int) -> range:
+        """Cell indices of ship `number` of a packed fleet (ships are straight lines)"""
+        first = fleet.find(number)
+        step = 1 if first + 1 < len(fleet) and fleet[first + 1] == number else self.config.size
+        return range(first, first + step * fleet.count(number), step)
+    
+    def _ship_sets(self, fleet: bytes, count: int) -> List[Set[Tuple[int, int]]]:
+        coords = self.config.coords
+        return [{coords[cell] for cell in self._ship_cells(fleet, number)} for number in range(1, count + 1)]
+    
+    def _cell_set(self, mask: int) -> Set[Tuple[int, int]]:
+        coords = self.config.coords
+        return {coords[cell] for cell in _bits(mask)}
+    
+    # The original collections, decoded on demand (read-only)
+    @property
+    def player_ships(self) -> List[Set[Tuple[int, int]]]:
+        return self._ship_sets(self._player_fleet, self._player_ship_count)
+    
+    @property
+    def bot_ships(self) -> List[Set[Tuple[int, int]]]:
+        return self._ship_sets(self._bot_fleet, self._bot_ship_count)
+    
+    @property
+    def player_hits(self) -> Set[Tuple[int, int]]:
+        return self._cell_set(self._player_hits)
+    
+    @property
+    def player_misses(self) -> Set[Tuple[int, int]]:
+        return self._cell_set(self._player_misses)
+    
+    @property
+    def bot_hits(self) -> Set[Tuple[int, int]]:
+        return self._cell_set(self._bot_hits)
+    
+    @property
+    def bot_misses(self) -> Set[Tuple[int, int]]:
+        return self._cell_set(self._bot_misses)
+    
+    @property
+    def player_destroyed(self) -> List[bool]:
+        return [bool(self._player_sunk >> i & 1) for i in range(self._player_ship_count)]
+    
+    @property
+    def bot_destroyed(self) -> List[bool]:
+        return [bool(self._bot_sunk >> i & 1) for i in range(self._bot_ship_count)]
     
     def display_boards(self):
         """Display both boards side by side"""
@@ -37,12 +266,12 @@ class GameState:
             # Player board (showing your ships and enemy hits)
             line = f"{row+1:2} "
             for col in range(BOARD_SIZE):
-                cell = (row, col)
-                if cell in self.bot_hits:
+                cell = row * BOARD_SIZE + col
+                if self._bot_hits >> cell & 1:
                     line += "X "  # Enemy hit your ship
-                elif cell in self.bot_misses:
+                elif self._bot_misses >> cell & 1:
                     line += "· "  # Enemy missed
-                elif any(cell in ship for ship in self.player_ships):
+                elif self._player_fleet[cell]:
                     line += "S "  # Your ship
                 else:
                     line += "~ "  # Water
@@ -51,10 +280,10 @@ class GameState:
             line += "    "
             line += f"{row+1:2} "
             for col in range(BOARD_SIZE):
-                cell = (row, col)
-                if cell in self.player_hits:
+                cell = row * BOARD_SIZE + col
+                if self._player_hits >> cell & 1:
                     line += "X "  # You hit enemy ship
-                elif cell in self.player_misses:
+                elif self._player_misses >> cell & 1:
                     line += "· "  # You missed
                 else:
                     line += "~ "  # Unknown
@@ -66,10 +295,13 @@ class GameState:
     
     def is_valid_move(self, coord: Tuple[int, int], is_player: bool) -> bool:
         """Check if a move is valid (not already tried)"""
+        cell = self.config.index.get(coord)
+        if cell is None:
+            return True  # off the board, so never tried; callers check the bounds
         if is_player:
-            return coord not in self.player_hits and coord not in self.player_misses
+            return not (self._player_hits | self._player_misses) >> cell & 1
         else:
-            return coord not in self.bot_hits and coord not in self.bot_misses
+            return not (self._bot_hits | self._bot_misses) >> cell & 1
     
     def process_move(self, coord: Tuple[int, int], is_player: bool) -> Tuple[bool, bool]:
         """
@@ -79,48 +311,118 @@ class GameState:
         It checks if the move is a hit, and if so, if the ship is destroyed.
         If the ship is destroyed, it marks all surrounding cells as misses.
         """
+        cell = self.config.index[coord]
         if is_player:
             # Player shoots at bot
             # Check if the move is a hit
-            for i, ship in enumerate(self.bot_ships):
-                if coord in ship:
-                    self.player_hits.add(coord)
-                    # Check if ship is destroyed
-                    if ship.issubset(self.player_hits) and not self.bot_destroyed[i]: # (true, false) -> ship hit and not destroyed
-                        self.bot_destroyed[i] = True
-                        self._mark_surrounding_as_miss(ship, True)
-                        return True, True # (hit, destroyed)
-                    return True, False # (hit, not destroyed)
-            # If the move was not a hit, mark it as a miss
-            self.player_misses.add(coord)
-            # Return that the move was not a hit
-            return False, False # (not hit, not destroyed)
+            ship = self._bot_fleet[cell]
+            if not ship:
+                # If the move was not a hit, mark it as a miss
+                self._player_misses |= 1 << cell
+                return False, False # (not hit, not destroyed)
+            self._player_hits |= 1 << cell
+            # Check if ship is destroyed
+            cells = self._ship_cells(self._bot_fleet, ship)
+            if self._bot_sunk >> (ship - 1) & 1 or not all(self._player_hits >> c & 1 for c in cells):
+                return True, False # (hit, not destroyed)
+            self._bot_sunk |= 1 << (ship - 1)
+            self._mark_surrounding_as_miss(cells, True)
+            return True, True # (hit, destroyed)
         else:
             # Bot shoots at player
-            # Check if the move is a hit
-            for i, ship in enumerate(self.player_ships):
-                if coord in ship:
-                    self.bot_hits.add(coord)
-                    # Check if ship is destroyed
-                    if ship.issubset(self.bot_hits) and not self.player_destroyed[i]:
-                        self.player_destroyed[i] = True
-                        self._mark_surrounding_as_miss(ship, False)
-                        return True, True
-                    return True, False
-                
-            self.bot_misses.add(coord)
-            return False, False
+            ship = self._player_fleet[cell]
+            self.bot_untried.remove(coord)
+            if not ship:
+                self._bot_misses |= 1 << cell
+                return False, False
+            self._bot_hits |= 1 << cell
+            cells = self._ship_cells(self._player_fleet, ship)
+            if self._player_sunk >> (ship - 1) & 1 or not all(self._bot_hits >> c & 1 for c in cells):
+                return True, False
+            self._player_sunk |= 1 << (ship - 1)
+            self._mark_surrounding_as_miss(cells, False)
+            return True, True
+    
+    def process_moves(self, coords: List[Tuple[int, int]], is_player: bool) -> List[Tuple[bool, bool]]:
+        """
+        Process a salvo of distinct moves and return (is_hit, ship_destroyed) for each
+        
+        The results and the resulting state are the same as calling process_move
+        for every coordinate in turn, but the salvo is resolved in one pass:
+        one lookup per shot, one completeness check per ship that was hit,
+        and one update marking the surroundings of every ship the salvo sank.
+        A single shot has nothing to share, so it goes straight to process_move.
+        """
+        if len(coords) == 1:
+            return [self.process_move(coords[0], is_player)]
+        if is_player:
+            fleet, hits, misses, sunk_ships = self._bot_fleet, self._player_hits, self._player_misses, self._bot_sunk
+        else:
+            fleet, hits, misses, sunk_ships = self._player_fleet, self._bot_hits, self._bot_misses, self._player_sunk
+        
+        tried = hits | misses
+        index = self.config.index
+        results = []
+        last_hit = {}  # ship number -> position in the salvo of the shot that hit it last
+        for coord in coords:
+            cell = index[coord]
+            ship = fleet[cell]
+            if ship:
+                hits |= 1 << cell
+                last_hit[ship] = len(results)
+                results.append((True, False))
+            else:
+                misses |= 1 << cell
+                results.append((False, False))
+        
+        if last_hit:
+            neighbourhood = self.config.neighbourhood
+            surrounding = 0
+            for ship, i in last_hit.items():
+                cells = self._ship_cells(fleet, ship)
+                if not sunk_ships >> (ship - 1) & 1 and all(hits >> c & 1 for c in cells):
+                    sunk_ships |= 1 << (ship - 1)
+                    results[i] = (True, True)
+                    for c in cells:
+                        surrounding |= neighbourhood[c]
+            misses |= surrounding & ~hits
+        if not is_player:
+            self.bot_untried.remove_mask((hits | misses) & ~tried)
+        
+        if is_player:
+            self._player_hits, self._player_misses, self._bot_sunk = hits, misses, sunk_ships
+        else:
+            self._bot_hits, self._bot_misses, self._player_sunk = hits, misses, sunk_ships
+        return results
+    
+    def salvo_size(self, is_player: bool, shots: int = SALVO_SHIPS) -> int:
+        """Number of shots in a salvo: `shots`, or one per own ship afloat for SALVO_SHIPS, at most the untried cells"""
+        if shots == SALVO_SHIPS:
+            own_destroyed = self.player_destroyed if is_player else self.bot_destroyed
+            shots = sum(1 for destroyed in own_destroyed if not destroyed)
+        tried = self._player_hits | self._player_misses if is_player else self._bot_hits | self._bot_misses
+        return min(shots, self.config.cells - tried.bit_count())
     
-    def _mark_surrounding_as_miss(self, ship: Set[Tuple[int, int]], is_player: bool):
-        """Mark all surrounding cells as miss when a ship is destroyed"""
-        surrounding = get_surrounding_cells(ship)
+    def _mark_surrounding_as_miss(self, cells, is_player: bool):
+        """Mark all cells around a destroyed ship (given as cell indices) as miss"""
+        neighbourhood = self.config.neighbourhood
+        surrounding = 0
+        for cell in cells:
+            surrounding |= neighbourhood[cell]
         if is_player:
-            self.player_misses.update(surrounding - self.player_hits)
+            self._player_misses |= surrounding & ~self._player_hits
         else:
-            self.bot_misses.update(surrounding - self.bot_hits)
+            surrounding &= ~self._bot_hits
+            self._bot_misses |= surrounding
+            self.bot_untried.remove_mask(surrounding)
     
-    def get_bot_move(self) -> Tuple[int, int]:
-        """Get bot's next move using AI"""
+    def get_bot_move(self, mode: str = None) -> Tuple[int, int]:
+        """Get bot's next move using AI (`mode`, one of BOT_MODES, overrides bot_mode)"""
+        mode = mode or self.bot_mode
+        if mode == 'density':
+            return self._get_density_move()
+        if mode == 'learned':
+            return self._get_learned_move()
         
         # If in target mode (hit a ship but not destroyed)
         if self.bot_target_mode and self.bot_current_target:
@@ -181,34 +483,173 @@ class GameState:
         
         return None
     
+    def bot_board(self) -> Tuple[bytearray, dict]:
+        """The bot's view of the player board as density cell codes, and the sizes of the ships afloat"""
+        board = bytearray(self.config.cells)
+        fleet = self._player_fleet
+        remaining = {}
+        sunk_cells = 0
+        for number in range(1, self._player_ship_count + 1):
+            if self._player_sunk >> (number - 1) & 1:
+                for cell in self._ship_cells(fleet, number):
+                    sunk_cells |= 1 << cell
+            else:
+                size = fleet.count(number)
+                remaining[size] = remaining.get(size, 0) + 1
+        
+        for cell in _bits(self._bot_misses | sunk_cells):
+            board[cell] = BLOCKED
+        for cell in _bits(self._bot_hits & ~sunk_cells):
+            board[cell] = HIT
+        return board, remaining
+    
+    def _density(self, board, remaining: dict) -> List[int]:
+        if self.density_engine:
+            return self.density_engine.density(board, remaining)
+        return compute_density(board, BOARD_SIZE, remaining)
+    
+    def _get_density_move(self) -> Tuple[int, int]:
+        """Fire at the cell covered by the most legal placements of the ships still afloat"""
+        board, remaining = self.bot_board()
+        return pick_densest_cell(self._density(board, remaining), board, BOARD_SIZE)
+    
+    def _get_policy(self):
+        if self.policy is None:
+            from src.learned_policy import load_policy
+            self.policy = load_policy()
+        return self.policy
+    
+    def _get_learned_move(self) -> Tuple[int, int]:
+        """Fire where the trained model scores a ship most likely"""
+        board, _ = self.bot_board()
+        return self._get_policy().pick(board)
+    
+    def get_bot_salvo(self, shots: int, mode: str = None) -> List[Tuple[int, int]]:
+        """Get the bot's moves for a salvo of `shots` shots, chosen together (`mode` overrides bot_mode)"""
+        mode = mode or self.bot_mode
+        if mode == 'density':
+            return self._get_density_salvo(shots)
+        if mode == 'learned':
+            return self._get_learned_salvo(shots)
+        return self._get_classic_salvo(shots)
+    
+    def _open_targets(self) -> List[List[Tuple[int, int]]]:
+        """Bot hits on ships not sunk yet, one group per ship (ships never touch, so a group is a connected line)"""
+        open_hits = self.bot_hits
+        for ship, destroyed in zip(self.player_ships, self.player_destroyed):
+            if destroyed:
+                open_hits -= ship
+        
+        groups = []
+        while open_hits:
+            stack = [open_hits.pop()]
+            group = []
+            while stack:
+                cell = stack.pop()
+                group.append(cell)
+                for adj in get_adjacent_cells(cell[0], cell[1], include_diagonal=False):
+                    if adj in open_hits:
+                        open_hits.remove(adj)
+                        stack.append(adj)
+            groups.append(group)
+        return groups
+    
+    def _fill_salvo(self, chosen: List[Tuple[int, int]], shots: int,
+                    ranked: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Top up a salvo with cells from `ranked` (best first).
+        
+        Cells next to a shot already in the salvo are held back while others
+        are left: if both were ship cells they would most likely be the same
+        ship, so spreading the hunting shots finds more ships per salvo.
+        """
+        near = set()
+        for row, col in chosen:
+            near.add((row, col))
+            near.update(get_adjacent_cells(row, col))
+        held_back = []
+        for cell in ranked:
+            if len(chosen) >= shots:
+                break
+            if cell in near:
+                if cell not in chosen:
+                    held_back.append(cell)
+                continue
+            chosen.append(cell)
+            near.add(cell)
+            near.update(get_adjacent_cells(cell[0], cell[1]))
+        chosen.extend(held_back[:shots - len(chosen)])
+        return chosen
+    
+    def _get_classic_salvo(self, shots: int) -> List[Tuple[int, int]]:
+        """Finish off every hit ship (adjacent cells or both ends of the axis) first, then hunt at random"""
+        chosen = []
+        for group in self._open_targets():
+            if len(group) == 1:
+                candidates = get_adjacent_cells(group[0][0], group[0][1], include_diagonal=False)
+            elif len({row for row, _ in group}) == 1:
+                row = group[0][0]
+                cols = [col for _, col in group]
+                candidates = [(row, min(cols) - 1), (row, max(cols) + 1)]
+            else:
+                col = group[0][1]
+                rows = [row for row, _ in group]
+                candidates = [(min(rows) - 1, col), (max(rows) + 1, col)]
+            random.shuffle(candidates)
+            chosen.extend(cell for cell in candidates
+                          if 0 <= cell[0] < BOARD_SIZE and 0 <= cell[1] < BOARD_SIZE
+                          and self.is_valid_move(cell, False) and cell not in chosen)
+        
+        untried = list(self.bot_untried)
+        random.shuffle(untried)
+        return self._fill_salvo(chosen[:shots], shots, untried)
+    
+    def _get_density_salvo(self, shots: int) -> List[Tuple[int, int]]:
+        """Fire at the densest cells of a single heatmap, spread out while hunting"""
+        board, remaining = self.bot_board()
+        density = self._density(board, remaining)
+        cells = [cell for cell, code in enumerate(board) if code == UNKNOWN]
+        random.shuffle(cells)
+        cells.sort(key=lambda cell: density[cell], reverse=True)  # stable, so ties stay in random order
+        ranked = [divmod(cell, BOARD_SIZE) for cell in cells]
+        
+        chosen = []
+        if HIT in board:
+            # Targeting: every cell that can still hold a hit ship goes in first, side by side
+            chosen = [coord for coord, cell in zip(ranked, cells) if density[cell]][:shots]
+        return self._fill_salvo(chosen, shots, ranked)
+    
+    def _get_learned_salvo(self, shots: int) -> List[Tuple[int, int]]:
+        """The best cells of one model evaluation, spread out while hunting"""
+        board, _ = self.bot_board()
+        ranked = self._get_policy().ranked(board)
+        if HIT in board:
+            return ranked[:shots]
+        return self._fill_salvo([], shots, ranked)
+    
     def _get_random_move(self) -> Tuple[int, int]:
         """Get a random valid move"""
-        attempts = 0
-        while attempts < 1000:
-            row = random.randint(0, BOARD_SIZE - 1)
-            col = random.randint(0, BOARD_SIZE - 1)
-            if self.is_valid_move((row, col), False):
-                return (row, col)
-            attempts += 1
+        if not self.bot_untried:
+            raise Exception("No valid moves available")
         
-        # Fallback: find any valid cell
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
-                if self.is_valid_move((row, col), False):
-                    return (row, col)
-        
-        raise Exception("No valid moves available")
+        # Every ship left covers two cells, so one checkerboard colour is enough to find them all
+        fleet = self._player_fleet
+        if self.parity_hunting and self.bot_untried.count(0) and all(
+                self._player_sunk >> (number - 1) & 1 or fleet.count(number) > 1
+                for number in range(1, self._player_ship_count + 1)):
+            return self.bot_untried.sample(0)
+        return self.bot_untried.sample()
     
     def update_bot_state(self, coord: Tuple[int, int], is_hit: bool, ship_destroyed: bool):
         """Update bot AI state after a move"""
         if is_hit:
-            self.bot_current_target.append(coord)
+            self.bot_current_target += (coord,)
             self.bot_target_mode = True
             
             if ship_destroyed:
                 # Ship destroyed, return to random mode
                 self.bot_target_mode = False
-                self.bot_current_target = []
+                self.bot_current_target = ()
                 self.bot_direction = None
         else:
             # Miss - continue targeting if still have targets
@@ -219,9 +660,9 @@ class GameState:
         """Check if game is over and return winner"""
 
 
-        if all(self.bot_destroyed):
+        if self._bot_sunk == (1 << self._bot_ship_count) - 1:
             return True, "player"
-        if all(self.player_destroyed):
+        if self._player_sunk == (1 << self._player_ship_count) - 1:
             return True, "bot"
         return False, None
     
@@ -255,3 +696,147 @@ class GameState:
                     sum(1 for x in self.bot_destroyed if not x) #the number of destroyed ships for the bot
                 ])
 
+
+
+def benchmark_salvo(salvo_sizes: List[int] = None, games: int = 2000, seed: int = 0, repeats: int = 7):
+    """Time resolving whole salvos with process_moves against one process_move call per shot"""
+    from src.bot_generation import generate_bot_ships
+    
+    salvo_sizes = salvo_sizes or [1, 3, 5, 10]
+    random.seed(seed)
+    fleets = [generate_bot_ships() for _ in range(games)]
+    cells = [(row, col) for row in range(BOARD_SIZE) for col in range(BOARD_SIZE)]
+    
+    print(f"{games} games fired out in salvos, {BOARD_SIZE}x{BOARD_SIZE}")
+    for k in salvo_sizes:
+        salvos = []
+        for _ in fleets:
+            random.shuffle(cells)
+            salvos.append([cells[i:i + k] for i in range(0, len(cells), k)])
+        
+        timings = {False: float('inf'), True: float('inf')}
+        states = {}
+        for _ in range(repeats):  # best of several runs, alternating, to keep other load out of the comparison
+            for batched in (False, True):
+                games_states = [GameState(fleet, fleet) for fleet in fleets]
+                start = time.perf_counter()
+                for game_state, game_salvos in zip(games_states, salvos):
+                    for salvo in game_salvos:
+                        if batched:
+                            game_state.process_moves(salvo, False)
+                        else:
+                            for coord in salvo:
+                                game_state.process_move(coord, False)
+                timings[batched] = min(timings[batched], time.perf_counter() - start)
+                states[batched] = [(s.bot_hits, s.bot_misses, s.player_destroyed) for s in games_states]
+        
+        if states[True] != states[False]:
+            print("ERROR: Batched and single resolution left different game states!")
+            return False
+        per_salvo = {batched: timings[batched] / sum(map(len, salvos)) * 1e6 for batched in timings}
+        print(f"  k={k:2}: {per_salvo[False]:6.1f} us as single calls, {per_salvo[True]:6.1f} us batched "
+              f"(speed-up {timings[False] / timings[True]:.2f}x)")
+    return True
+
+def benchmark_random_moves(games: int = 500, seed: int = 0):
+    """Time hunt-mode move selection by move number: retry sampling against the untried-cell pool"""
+    
+    def retry_random_move(game_state: GameState) -> Tuple[int, int]:
+        """The former _get_random_move: draw coordinates until one has not been tried"""
+        for _ in range(1000):
+            row = random.randint(0, BOARD_SIZE - 1)
+            col = random.randint(0, BOARD_SIZE - 1)
+            if game_state.is_valid_move((row, col), False):
+                return (row, col)
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                if game_state.is_valid_move((row, col), False):
+                    return (row, col)
+    
+    cells = BOARD_SIZE * BOARD_SIZE
+    buckets = 10
+    random.seed(seed)
+    timings = {}
+    for name, choose in (('retry', retry_random_move), ('pool', GameState._get_random_move)):
+        elapsed = [0.0] * cells
+        for _ in range(games):
+            game_state = GameState([], [])  # no ships: every shot misses, so the bot fires at every cell
+            for move in range(cells):
+                start = time.perf_counter()
+                coord = choose(game_state)
+                elapsed[move] += time.perf_counter() - start
+                game_state.process_move(coord, False)
+        timings[name] = elapsed
+    
+    print(f"Hunt-mode move selection on {BOARD_SIZE}x{BOARD_SIZE}, average over {games} games (us per move)")
+    print("  moves      retry    pool")
+    for bucket in range(buckets):
+        moves = range(bucket * cells // buckets, (bucket + 1) * cells // buckets)
+        retry, pool = (sum(timings[name][move] for move in moves) / len(moves) / games * 1e6 for name in ('retry', 'pool'))
+        print(f"  {moves.start + 1:3}-{moves.stop:3}  {retry:7.2f} {pool:7.2f}")
+
+def test_session_memory(sessions: int = 5000, max_bytes: int = 1280) -> bool:
+    """Test that a live game stays under `max_bytes` of memory, at the start, middle and end of the game"""
+    import tracemalloc
+    from src.bot_generation import generate_bot_ships
+    
+    print(f"Testing memory per game with {sessions} live games...")
+    random.seed(0)
+    fleets = [generate_bot_ships() for _ in range(100)]
+    shots = [(row, col) for row in range(BOARD_SIZE) for col in range(BOARD_SIZE)]
+    random.shuffle(shots)
+    get_board_config(BOARD_SIZE)  # shared by every game
+    
+    for turns in (0, 30, 60):
+        tracemalloc.start()
+        games = []
+        for n in range(sessions):
+            game_state = GameState(fleets[n % len(fleets)], fleets[(n + 1) % len(fleets)])
+            for coord in shots[:turns]:
+                if game_state.is_game_over()[0]:
+                    break
+                game_state.turn += 1
+                game_state.process_move(coord, True)
+                bot_coord = game_state.get_bot_move()
+                game_state.update_bot_state(bot_coord, *game_state.process_move(bot_coord, False))
+            games.append(game_state)
+        per_game = tracemalloc.get_traced_memory()[0] / sessions
+        tracemalloc.stop()
+        del games
+        
+        print(f"  after {turns:2} turns: {per_game:6.0f} bytes per game, {per_game * 100000 / 2**20:5.1f} MB for 100k games")
+        if per_game > max_bytes:
+            print(f"ERROR: A game takes more than {max_bytes} bytes!")
+            return False
+    
+    print("All tests passed!")
+    return True
+
+def test_large_board(board_size: int = 20) -> bool:
+    """Test that the untried-cell pool works past 16x16, where cell indices need two bytes"""
+    print(f"Testing untried cells on a {board_size}x{board_size} board...")
+    random.seed(0)
+    untried = UntriedCells(board_size)
+    left = {(row, col) for row in range(board_size) for col in range(board_size)}
+    while left:
+        coord = untried.sample(random.randrange(2) if untried.count(0) and untried.count(1) else None)
+        if coord not in left or coord not in untried:
+            print("ERROR: Sampled a cell that was already removed!")
+            return False
+        left.discard(coord)
+        if len(left) % 2:
+            untried.remove(coord)
+        else:
+            untried.remove_mask(1 << untried.config.index[coord])
+        if len(untried) != len(left) or set(untried) != left:
+            print("ERROR: Untried cells out of step after a removal!")
+            return False
+    
+    print("All tests passed!")
+    return True
+
+if __name__ == "__main__":
+    test_session_memory()
+    test_large_board()
+    benchmark_salvo()
+    benchmark_random_moves()
@@ -0,0 +1,330 @@
+import argparse
+import os
+import random
+import struct
+import time
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+from src.density import UNKNOWN, BLOCKED, HIT
+from src.game_archive import GameArchive
+from src.utils import *
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed for the 'learned' bot mode
+    np = None
+
+# Weights file layout
+#
+# Header:  b'BSLP', version (u8), board size (u8), kernel size (u8), hidden channels (u8)
+# Then little-endian float32 arrays, back to back:
+#     conv weights  (CHANNELS * kernel * kernel, hidden)
+#     conv bias     (hidden,)
+#     output        (hidden,)
+#     cell bias     (board size * board size,)
+MAGIC = b'BSLP'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBB')
+CHANNELS = 3  # one-hot of the density cell codes: unknown, blocked, open hit
+DEFAULT_POLICY = 'data/learned_policy.bsp'
+SCORE_MARGIN = 0.5  # logits within which cells count as equally good
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The learned bot mode needs NumPy (pip install numpy)")
+
+
+@lru_cache(maxsize=None)
+def _patch_index(board_size: int, kernel: int):
+    """
+    Gather indices turning a flattened one-hot board into one row of
+    CHANNELS * kernel * kernel inputs per cell; neighbours off the board
+    point at one extra zero slot after the last input.
+    """
+    cells = board_size * board_size
+    half = kernel // 2
+    index = np.empty((cells, CHANNELS * kernel * kernel), dtype=np.intp)
+    for cell in range(cells):
+        row, col = divmod(cell, board_size)
+        k = 0
+        for channel in range(CHANNELS):
+            for dr in range(-half, half + 1):
+                for dc in range(-half, half + 1):
+                    r, c = row + dr, col + dc
+                    inside = 0 <= r < board_size and 0 <= c < board_size
+                    index[cell, k] = channel * cells + r * board_size + c if inside else CHANNELS * cells
+                    k += 1
+    return index
+
+
+class TargetingPolicy:
+    """
+    A tiny convolutional model from the shooter's view of a board to shot scores.
+
+    One kernel x kernel convolution with `hidden` ReLU channels, a 1x1
+    output layer and a learned bias per cell (edges and corners hold ships
+    less often). The score of a cell is the logit of it holding a ship that
+    is still afloat, so the policy fires at the highest score. Scores only
+    `margin` apart count as a tie that is broken at random (with `random`,
+    so seeded games replay), otherwise every game would follow the same
+    shot sequence.
+    """
+
+    def __init__(self, board_size: int = BOARD_SIZE, kernel: int = 5, hidden: int = 16, rng=None,
+                 margin: float = SCORE_MARGIN):
+        _require_numpy()
+        rng = rng or np.random.default_rng()
+        inputs = CHANNELS * kernel * kernel
+        self.board_size = board_size
+        self.kernel = kernel
+        self.hidden = hidden
+        self.margin = margin
+        self.conv = (rng.standard_normal((inputs, hidden)) * np.sqrt(2 / inputs)).astype(np.float32)
+        self.conv_bias = np.zeros(hidden, dtype=np.float32)
+        self.output = (rng.standard_normal(hidden) * np.sqrt(1 / hidden)).astype(np.float32)
+        self.cell_bias = np.zeros(board_size * board_size, dtype=np.float32)
+        self._index = _patch_index(board_size, kernel)
+
+    def _patches(self, boards):
+        """(batch, cells) cell codes -> (batch, cells, inputs) convolution inputs"""
+        one_hot = np.concatenate([boards == UNKNOWN, boards == BLOCKED, boards == HIT], axis=1).astype(np.float32)
+        one_hot = np.concatenate([one_hot, np.zeros((len(boards), 1), dtype=np.float32)], axis=1)
+        return one_hot[:, self._index]
+
+    def scores(self, board) -> 'np.ndarray':
+        """Shot scores for every cell of one board of density cell codes (higher is better)"""
+        codes = np.frombuffer(bytes(board), dtype=np.uint8)
+        one_hot = np.zeros(CHANNELS * codes.size + 1, dtype=np.float32)
+        one_hot[:-1] = (codes == np.arange(CHANNELS, dtype=np.uint8)[:, None]).ravel()
+        hidden = one_hot[self._index] @ self.conv + self.conv_bias
+        np.maximum(hidden, 0, out=hidden)
+        return hidden @ self.output + self.cell_bias
+
+    def _jittered_scores(self, board) -> 'np.ndarray':
+        """Scores plus up to `margin` of uniform noise, so near-equal cells come in random order"""
+        scores = self.scores(board)
+        if self.margin:
+            # 16 random bits per cell from one `random` call, scaled in a single vector operation
+            noise = np.frombuffer(random.getrandbits(16 * scores.size).to_bytes(2 * scores.size, 'little'), dtype='<u2')
+            scores += noise * np.float32(self.margin / 65536)
+        return scores
+
+    def pick(self, board) -> Tuple[int, int]:
+        """Fire at the unknown cell with the highest score, ties broken at random"""
+        scores = self._jittered_scores(board)
+        scores[np.frombuffer(bytes(board), dtype=np.uint8) != UNKNOWN] = -np.inf
+        return divmod(int(scores.argmax()), self.board_size)
+
+    def ranked(self, board) -> List[Tuple[int, int]]:
+        """Unknown cells, highest score first, ties in random order"""
+        scores = self._jittered_scores(board)
+        cells = [cell for cell in np.argsort(-scores, kind='stable').tolist() if board[cell] == UNKNOWN]
+        return [divmod(cell, self.board_size) for cell in cells]
+
+    def train(self, boards, targets, epochs: int = 10, batch_size: int = 256,
+              learning_rate: float = 0.003, rng=None, verbose: bool = True):
+        """
+        Fit the model with Adam on a logistic loss over the unknown cells.
+
+        `boards` holds one row of cell codes per position and `targets` is 1
+        where an unsunk ship lies in that position.
+        """
+        rng = rng or np.random.default_rng()
+        params = [self.conv, self.conv_bias, self.output, self.cell_bias]
+        moments = [np.zeros_like(p) for p in params]
+        squares = [np.zeros_like(p) for p in params]
+        step = 0
+
+        for epoch in range(epochs):
+            order = rng.permutation(len(boards))
+            total_loss = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                x = self._patches(boards[batch])
+                y = targets[batch].astype(np.float32)
+                mask = (boards[batch] == UNKNOWN).astype(np.float32)
+
+                pre = x @ self.conv + self.conv_bias
+                hidden = np.maximum(pre, 0)
+                logits = hidden @ self.output + self.cell_bias
+                probabilities = 1 / (1 + np.exp(-logits))
+                n = mask.sum()
+                total_loss += float(-(mask * (y * np.log(probabilities + 1e-7)
+                                              + (1 - y) * np.log(1 - probabilities + 1e-7))).sum())
+
+                d_logits = (probabilities - y) * mask / n
+                d_pre = d_logits[..., None] * self.output * (pre > 0)
+                grads = [
+                    np.einsum('bci,bch->ih', x, d_pre, optimize=True),
+                    d_pre.sum(axis=(0, 1)),
+                    np.einsum('bch,bc->h', hidden, d_logits, optimize=True),
+                    d_logits.sum(axis=0),
+                ]
+
+                step += 1
+                for param, grad, m, v in zip(params, grads, moments, squares):
+                    m *= 0.9
+                    m += 0.1 * grad
+                    v *= 0.999
+                    v += 0.001 * grad * grad
+                    param -= (learning_rate * (m / (1 - 0.9 ** step))
+                              / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)).astype(np.float32)
+
+            if verbose:
+                print(f"Epoch {epoch + 1}/{epochs}: loss {total_loss / (boards == UNKNOWN).sum():.4f}")
+
+    def save(self, filename: str):
+        """Write the weights atomically"""
+        tmp = filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.board_size, self.kernel, self.hidden))
+            for array in (self.conv, self.conv_bias, self.output, self.cell_bias):
+                f.write(array.astype('<f4').tobytes())
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename: str) -> 'TargetingPolicy':
+        _require_numpy()
+        with open(filename, 'rb') as f:
+            data = f.read()
+        magic, version, board_size, kernel, hidden = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a version {VERSION} policy file")
+
+        policy = cls(board_size, kernel, hidden)
+        pos = HEADER.size
+        for name in ('conv', 'conv_bias', 'output', 'cell_bias'):
+            array = getattr(policy, name)
+            setattr(policy, name, np.frombuffer(data, '<f4', array.size, pos).reshape(array.shape).astype(np.float32))
+            pos += 4 * array.size
+        return policy
+
+
+@lru_cache(maxsize=None)
+def load_policy(filename: str = DEFAULT_POLICY) -> TargetingPolicy:
+    """Load a weights file once per process"""
+    return TargetingPolicy.load(filename)
+
+def policy_available(filename: str = DEFAULT_POLICY) -> bool:
+    """Whether the 'learned' bot mode can be used"""
+    return np is not None and os.path.exists(filename)
+
+
+def positions_from_game(target_ships, moves) -> Iterator[Tuple[bytearray, List[int]]]:
+    """
+    Replay one side's shots at a fleet and yield, before every shot, the
+    shooter's board (density cell codes) and the cells where a ship is
+    still afloat (1) or not (0).
+    """
+    from src.gameplay import GameState
+
+    game_state = GameState(target_ships, target_ships)
+    for coord in moves:
+        board, _ = game_state.bot_board()
+        target = [0] * len(board)
+        for ship, destroyed in zip(game_state.player_ships, game_state.player_destroyed):
+            if not destroyed:
+                for row, col in ship:
+                    target[row * BOARD_SIZE + col] = 1
+        yield board, target
+        game_state.process_move(coord, False)
+
+def generate_training_data(games: int = 2000, shooter: str = 'bot', archive: str = None, seed: int = None):
+    """
+    Board positions and ship locations from headless games.
+
+    Both sides of every game contribute their positions. With `archive`
+    the games are read from a game archive instead of being played.
+    """
+    from src.bot_generation import generate_bot_ships
+    from src.simulation import play_headless_game
+
+    def games_to_replay():
+        if archive:
+            with GameArchive(archive) as records:
+                for record in records:
+                    moves = list(record.iter_moves())
+                    yield record.player_ships, record.bot_ships, moves
+                    del record
+        else:
+            rng = random.Random(seed)
+            for _ in range(games):
+                random.seed(rng.randrange(2**31))
+                player_ships, bot_ships = generate_bot_ships(), generate_bot_ships()
+                _, moves = play_headless_game(player_ships, bot_ships, shooter, shooter, seed=rng.randrange(2**31))
+                yield player_ships, bot_ships, moves
+
+    boards = bytearray()
+    targets = bytearray()
+    for player_ships, bot_ships, moves in games_to_replay():
+        for is_player, fleet in ((True, bot_ships), (False, player_ships)):
+            side_moves = [coord for player_move, coord, _ in moves if player_move == is_player]
+            for board, target in positions_from_game(fleet, side_moves):
+                boards += board
+                targets += bytes(target)
+
+    cells = BOARD_SIZE * BOARD_SIZE
+    return (np.frombuffer(bytes(boards), dtype=np.uint8).reshape(-1, cells),
+            np.frombuffer(bytes(targets), dtype=np.uint8).reshape(-1, cells))
+
+
+def benchmark(filename: str = DEFAULT_POLICY, fleets: int = 200, seed: int = 0):
+    """Time one move of the policy and compare shots to sink against the other bot modes"""
+    from src.bot_generation import generate_bot_ships
+    from src.simulation import shots_to_sink
+
+    policy = load_policy(filename)
+    random.seed(seed)
+    layouts = [generate_bot_ships() for _ in range(fleets)]
+
+    board = bytearray(BOARD_SIZE * BOARD_SIZE)
+    for cell in random.sample(range(len(board)), 30):
+        board[cell] = BLOCKED
+    policy.pick(board)  # warm up
+    repeats = 2000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        policy.pick(board)
+    print(f"Inference: {(time.perf_counter() - start) / repeats * 1e6:.1f} us per move "
+          f"({policy.kernel}x{policy.kernel} kernel, {policy.hidden} channels)")
+
+    for shooter in ('bot', 'density', 'learned'):
+        start = time.perf_counter()
+        shots = [shots_to_sink(ships, shooter, seed=n) for n, ships in enumerate(layouts)]
+        elapsed = time.perf_counter() - start
+        print(f"  {shooter:8}: {sum(shots) / len(shots):5.1f} shots to sink a fleet "
+              f"({elapsed / sum(shots) * 1e6:6.1f} us per shot)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the learned targeting policy from headless games")
+    parser.add_argument('--games', type=int, default=2000, help="Headless games to learn from")
+    parser.add_argument('--shooter', default='bot', help="Strategy playing the training games")
+    parser.add_argument('--archive', default=None, help="Learn from the games of an archive instead")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--kernel', type=int, default=5, help="Convolution size (odd)")
+    parser.add_argument('--hidden', type=int, default=16, help="Convolution channels")
+    parser.add_argument('--output', default=DEFAULT_POLICY, help="Weights file")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--benchmark', action='store_true', help="Only time and evaluate an existing weights file")
+    args = parser.parse_args()
+    _require_numpy()
+
+    if not args.benchmark:
+        source = args.archive or f"{args.games} '{args.shooter}' games"
+        print(f"Generating training positions from {source}...")
+        boards, targets = generate_training_data(args.games, args.shooter, args.archive, args.seed)
+        print(f"{len(boards)} positions")
+
+        rng = np.random.default_rng(args.seed)
+        policy = TargetingPolicy(BOARD_SIZE, args.kernel, args.hidden, rng)
+        policy.train(boards, targets, args.epochs, rng=rng)
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        policy.save(args.output)
+        print(f"Saved {os.path.getsize(args.output)} bytes of weights to {args.output}")
+        load_policy.cache_clear()
+
+    benchmark(args.output)
+
+if __name__ == "__main__":
+    main()
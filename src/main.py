@@ -1,8 +1,13 @@
 import os
+import socket
+import uuid
 
 from src.ship_input import get_player_ships
-from src.bot_generation import generate_bot_ships
-from src.gameplay import GameState
+from src.bot_generation import generate_bot_ships, pick_hard_layout
+from src.gameplay import BOT_MODES, SALVO_SHIPS, GameState
+from src.game_archive import GameArchiveWriter, result_code
+from src.events import EventBus, SocketFeed, move_events
+from src.learned_policy import policy_available
 from src.utils import save_ships_to_csv, coord_to_str, str_to_coord, BOARD_SIZE
 
 def clear_screen():
@@ -32,7 +37,11 @@ def setup_game():
     
     # Bot ship generation
     print("\nPhase 2: Generating bot ships...")
-    bot_ships = generate_bot_ships()
+    bot_ships = pick_hard_layout('data/hard_layouts.csv')
+    if bot_ships:
+        print("Bot ships picked from the hard layout pool (data/hard_layouts.csv)")
+    else:
+        bot_ships = generate_bot_ships()
     save_ships_to_csv(bot_ships, 'data/bot_ships.csv')
     print("Bot ships generated and saved to data/bot_ships.csv")
     
@@ -65,9 +74,47 @@ def get_player_move(game_state: GameState) -> tuple:
         except Exception as e:
             print(f"Error: {e}")
 
-def play_game(player_ships, bot_ships):
-    """Main game loop"""
-    game_state = GameState(player_ships, bot_ships)
+def get_player_salvo(game_state: GameState, shots: int) -> list:
+    """Get the player's moves for a salvo of `shots` shots"""
+    while True:
+        try:
+            print(f"\nYour turn! Fire {shots} shot{'s' if shots > 1 else ''}.")
+            move_str = input(f"Enter {shots} coordinates to attack (e.g., A1 C5 H8): ").strip().upper()
+            
+            if move_str in ['QUIT', 'EXIT']:
+                return None
+            
+            coords = [str_to_coord(part) for part in move_str.split()]
+            
+            if len(coords) != shots:
+                print(f"Enter exactly {shots} coordinates!")
+                continue
+            
+            if len(set(coords)) != len(coords):
+                print("Each coordinate can only be fired at once per salvo!")
+                continue
+            
+            if not all(0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE for row, col in coords):
+                print("Coordinates out of bounds!")
+                continue
+            
+            if not all(game_state.is_valid_move(coord, True) for coord in coords):
+                print("You already tried one of those coordinates!")
+                continue
+            
+            return coords
+            
+        except (ValueError, IndexError):
+            print("Invalid format! Use format like: A1 C5 H8")
+        except Exception as e:
+            print(f"Error: {e}")
+
+def play_game(player_ships, bot_ships, bus: EventBus = None, salvo: int = None, bot_mode: str = 'classic'):
+    """Main game loop (with `salvo` set, each side fires that many shots per turn, SALVO_SHIPS = one per ship afloat)"""
+    game_state = GameState(player_ships, bot_ships, bot_mode)
+    moves = []  # (is_player, coord, result) for the game archive
+    turns_played = 0
+    game_id = uuid.uuid4().hex[:8]  # identifies this game on the event feed
     
     # Initialize game state CSV
     if os.path.exists('data/game_state.csv'):
@@ -87,25 +134,40 @@ def play_game(player_ships, bot_ships):
         print(f"\n--- Turn {game_state.turn} ---")
         
         # Player's turn
-        player_coord = get_player_move(game_state)
+        if salvo is None:
+            player_coord = get_player_move(game_state)
+            player_coords = [player_coord] if player_coord else None
+        else:
+            player_coords = get_player_salvo(game_state, game_state.salvo_size(True, salvo))
         
-        if player_coord is None:
+        if player_coords is None:
             print("\nGame ended by player.")
             break
         
-        player_hit, player_destroyed = game_state.process_move(player_coord, True)
-        
-        move_info['player_move'] = coord_to_str(player_coord[0], player_coord[1])
+        turns_played += 1
+        player_results = game_state.process_moves(player_coords, True)
+        if bus:
+            for event in move_events(game_id, game_state, True, player_coords, player_results):
+                bus.publish(event)
+        player_moves, player_outcomes = [], []
+        for player_coord, (player_hit, player_destroyed) in zip(player_coords, player_results):
+            moves.append((True, player_coord, result_code(player_hit, player_destroyed)))
+            
+            coord_str = coord_to_str(player_coord[0], player_coord[1])
+            player_moves.append(coord_str)
+            
+            if player_destroyed:
+                print(f"\nHIT! You destroyed an enemy ship at {coord_str}!")
+                player_outcomes.append("HIT+DESTROYED")
+            elif player_hit:
+                print(f"\nHIT at {coord_str}!")
+                player_outcomes.append("HIT")
+            else:
+                print(f"\nMISS at {coord_str}")
+                player_outcomes.append("MISS")
         
-        if player_destroyed:
-            print(f"\nHIT! You destroyed an enemy ship at {move_info['player_move']}!")
-            move_info['player_result'] = "HIT+DESTROYED"
-        elif player_hit:
-            print(f"\nHIT at {move_info['player_move']}!")
-            move_info['player_result'] = "HIT"
-        else:
-            print(f"\nMISS at {move_info['player_move']}")
-            move_info['player_result'] = "MISS"
+        move_info['player_move'] = ' '.join(player_moves)
+        move_info['player_result'] = ' '.join(player_outcomes)
         
         # Check if player won
         game_over, winner = game_state.is_game_over()
@@ -119,23 +181,36 @@ def play_game(player_ships, bot_ships):
         
         # Bot's turn
         print("\nBot is thinking...")
-        bot_coord = game_state.get_bot_move()
-        bot_hit, bot_destroyed = game_state.process_move(bot_coord, False)
-        
-        # Update bot AI state
-        game_state.update_bot_state(bot_coord, bot_hit, bot_destroyed)
-        
-        move_info['bot_move'] = coord_to_str(bot_coord[0], bot_coord[1])
-        
-        if bot_destroyed:
-            print(f"Bot HIT and DESTROYED your ship at {move_info['bot_move']}!")
-            move_info['bot_result'] = "HIT+DESTROYED"
-        elif bot_hit:
-            print(f"Bot HIT your ship at {move_info['bot_move']}!")
-            move_info['bot_result'] = "HIT"
+        if salvo is None:
+            bot_coords = [game_state.get_bot_move()]
         else:
-            print(f"Bot MISSED at {move_info['bot_move']}")
-            move_info['bot_result'] = "MISS"
+            bot_coords = game_state.get_bot_salvo(game_state.salvo_size(False, salvo))
+        bot_results = game_state.process_moves(bot_coords, False)
+        if bus:
+            for event in move_events(game_id, game_state, False, bot_coords, bot_results):
+                bus.publish(event)
+        bot_moves, bot_outcomes = [], []
+        for bot_coord, (bot_hit, bot_destroyed) in zip(bot_coords, bot_results):
+            moves.append((False, bot_coord, result_code(bot_hit, bot_destroyed)))
+            
+            # Update bot AI state
+            game_state.update_bot_state(bot_coord, bot_hit, bot_destroyed)
+            
+            coord_str = coord_to_str(bot_coord[0], bot_coord[1])
+            bot_moves.append(coord_str)
+            
+            if bot_destroyed:
+                print(f"Bot HIT and DESTROYED your ship at {coord_str}!")
+                bot_outcomes.append("HIT+DESTROYED")
+            elif bot_hit:
+                print(f"Bot HIT your ship at {coord_str}!")
+                bot_outcomes.append("HIT")
+            else:
+                print(f"Bot MISSED at {coord_str}")
+                bot_outcomes.append("MISS")
+        
+        move_info['bot_move'] = ' '.join(bot_moves)
+        move_info['bot_result'] = ' '.join(bot_outcomes)
         
         # Save state
         game_state.save_state_to_csv('data/game_state.csv', move_info)
@@ -150,6 +225,15 @@ def play_game(player_ships, bot_ships):
             break
         
         input("\nPress Enter to continue...")
+    
+    # Keep every game in the append-only archive (the CSV only holds the last one)
+    if moves:
+        with GameArchiveWriter('data/games.bsa') as archive:
+            archive.append(player_ships, bot_ships, moves, salvo is not None)
+        game_id = archive.count - 1  # numbered on commit, after any games other writers added
+        print(f"Game saved to data/games.bsa as game #{game_id}")
+    
+    return turns_played
 
 def main():
     """Main entry point"""
@@ -160,17 +244,44 @@ def main():
         if player_ships is None:
             return
         
+        # Live event feed for spectators (Unix sockets only)
+        bus = EventBus()
+        feed = None
+        if hasattr(socket, 'AF_UNIX'):
+            try:
+                feed = SocketFeed(bus, 'data/events.sock')
+                print("\nSpectators can follow the game with: python -m src.events data/events.sock")
+            except OSError as e:
+                print(f"\nLive event feed unavailable ({e}); playing without spectators.")
+        
+        # Salvo rules: one shot per ship still afloat each turn
+        salvo = None
+        if input("\nPlay with salvo rules (one shot per ship afloat each turn)? [y/N]: ").strip().lower() in ['y', 'yes']:
+            salvo = SALVO_SHIPS
+        
+        # Bot opponent ('learned' needs NumPy and weights trained with python -m src.learned_policy)
+        bot_modes = [mode for mode in BOT_MODES if mode != 'learned' or policy_available()]
+        bot_mode = input(f"Bot mode ({'/'.join(bot_modes)}) [classic]: ").strip().lower() or 'classic'
+        if bot_mode not in bot_modes:
+            print("Unknown bot mode, playing classic.")
+            bot_mode = 'classic'
+        
         input("\nPress Enter to start the game...")
         clear_screen()
         
         # Play phase
-        play_game(player_ships, bot_ships)
+        try:
+            turns = play_game(player_ships, bot_ships, bus, salvo, bot_mode)
+        finally:
+            if feed:
+                feed.close()
         
         print("\n" + "="*50)
         print("GAME STATISTICS")
         print("="*50)
         print(f"Game log saved to: data/game_state.csv")
-        print(f"Total turns: {open('data/game_state.csv').read().count('\\n') - 1}")
+        print(f"Total turns: {turns}")
+        print("Statistics over all archived games: python -m src.analytics")
         print("\nThank you for playing Battleship!")
         print("="*50)
         
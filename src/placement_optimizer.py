@@ -0,0 +1,205 @@
+import argparse
+import json
+import math
+import os
+import random
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+from src.bot_generation import generate_bot_ships, random_ship_position
+from src.simulation import SHOOTERS, shots_to_sink
+from src.utils import *
+
+Fleet = List[List[Tuple[int, int]]]
+
+def _play_games(args) -> List[int]:
+    """Worker: shots needed to sink one fleet for a chunk of game seeds"""
+    ships, shooter, seeds = args
+    return [shots_to_sink(ships, shooter, seed) for seed in seeds]
+
+def evaluate_fleet(pool: Pool, ships: Fleet, shooter: str, seeds: List[int], workers: int) -> float:
+    """Average shots the shooter needs to sink a fleet, spreading the games over the pool"""
+    chunks = [(ships, shooter, seeds[i::workers]) for i in range(workers)]
+    results = [shots for chunk in pool.map(_play_games, chunks) for shots in chunk]
+    return sum(results) / len(results)
+
+def mutate_fleet(ships: Fleet, rng: random.Random, max_attempts: int = 1000) -> Fleet:
+    """Move one randomly chosen ship to another legal position"""
+    for _ in range(max_attempts):
+        index = rng.randrange(len(ships))
+        others = ships[:index] + ships[index + 1:]
+        occupied = {cell for ship in others for cell in ship}
+        other_sets = [set(ship) for ship in others]
+
+        for _ in range(100):
+            coords = random_ship_position(len(ships[index]), rng)
+            ship_set = set(coords)
+            if ship_set & occupied or ships_touch(ship_set, other_sets):
+                continue
+            if ship_set == set(ships[index]):
+                continue
+            return ships[:index] + [coords] + ships[index + 1:]
+
+    raise ValueError("No ship of the fleet can be moved to another legal position")
+
+def fleet_key(ships: Fleet) -> frozenset:
+    """Order-independent identity of a layout"""
+    return frozenset(frozenset(ship) for ship in ships)
+
+def save_checkpoint(filename: str, state: dict):
+    """Write the optimizer state atomically so an interrupted run never leaves a broken file"""
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, filename)
+
+def load_checkpoint(filename: str) -> Optional[dict]:
+    """Load optimizer state, or None if there is nothing to resume"""
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as f:
+        state = json.load(f)
+    state['current'] = [[tuple(cell) for cell in ship] for ship in state['current']]
+    state['pool'] = [(score, [[tuple(cell) for cell in ship] for ship in ships]) for score, ships in state['pool']]
+    version, internal, gauss_next = state['rng_state']
+    state['rng_state'] = (version, tuple(internal), gauss_next)
+    return state
+
+def check_settings(filename: str, state: dict, settings: dict):
+    """Refuse to resume a checkpoint that was written for a different run"""
+    saved = state.get('settings', {'shooter': state['shooter'], 'games': len(state['seeds'])})
+    mismatched = [f"{name}={saved[name]!r} (asked for {value!r})"
+                  for name, value in settings.items()
+                  if name in saved and value is not None and saved[name] != value]
+    if mismatched:
+        raise ValueError(f"{filename} was written by a run with {', '.join(mismatched)}; "
+                         f"use the same settings to resume it or pass another --checkpoint")
+
+def update_pool(pool: List[Tuple[float, Fleet]], score: float, ships: Fleet, size: int) -> List[Tuple[float, Fleet]]:
+    """Keep the `size` best distinct layouts seen so far"""
+    key = fleet_key(ships)
+    if any(fleet_key(s) == key for _, s in pool):
+        return pool
+    pool = sorted(pool + [(score, ships)], key=lambda item: item[0], reverse=True)
+    return pool[:size]
+
+def validate_pool(pool: Pool, layouts: List[Tuple[float, Fleet]], shooter: str, seeds: List[int],
+                  workers: int) -> List[Tuple[float, Fleet]]:
+    """Re-score layouts on other game seeds than the search used and rank them by the new scores"""
+    rescored = [(evaluate_fleet(pool, ships, shooter, seeds, workers), ships) for _, ships in layouts]
+    return sorted(rescored, key=lambda item: item[0], reverse=True)
+
+def optimize_placement(iterations: int = 2000, games: int = 200, shooter: str = 'bot',
+                       workers: int = None, pool_size: int = 20, start_temperature: float = 1.0,
+                       checkpoint: str = 'data/optimizer_checkpoint.json',
+                       output: str = 'data/hard_layouts.csv', checkpoint_every: int = 25,
+                       seed: int = None, validation_games: int = 1000) -> List[Tuple[float, Fleet]]:
+    """
+    Search for fleet layouts that take a shooter as many shots as possible to sink.
+
+    Simulated annealing: each step moves one ship, scores the new layout by
+    the average shots over `games` headless games (the same game seeds for
+    every layout, so scores are directly comparable) and accepts worse
+    layouts with a probability that shrinks as the temperature cools.
+    The search state is checkpointed regularly and resumed from the
+    checkpoint file if one exists; resuming a checkpoint written with other
+    settings raises ValueError. The best layouts are written to `output`
+    for `setup_game` to use. Scores on the search seeds are optimistic (the
+    search kept whatever happened to do well on them), so once the search
+    ends the pool is re-scored on `validation_games` fresh seeds and ranked
+    and saved with those scores.
+    """
+    workers = workers or os.cpu_count() or 1
+    settings = {'shooter': shooter, 'games': games, 'iterations': iterations, 'pool_size': pool_size,
+                'start_temperature': start_temperature, 'seed': seed, 'validation_games': validation_games}
+    state = load_checkpoint(checkpoint)
+
+    if state is None:
+        rng = random.Random(seed)
+        current = generate_bot_ships(rng)
+        state = {
+            'iteration': 0,
+            'current': current,
+            'current_score': None,
+            'pool': [],
+            'seeds': [rng.randrange(2**31) for _ in range(games)],
+            'shooter': shooter,
+            'settings': settings,
+            'rng_state': rng.getstate(),
+        }
+    else:
+        check_settings(checkpoint, state, settings)
+        if state.get('validated'):
+            print(f"{checkpoint} has already finished all {iterations} iterations; "
+                  f"pass another --checkpoint to start a new run")
+            return state['pool']
+        if state['iteration'] < iterations:
+            print(f"Resuming from {checkpoint} at iteration {state['iteration']}")
+        rng = random.Random()
+        rng.setstate(state['rng_state'])
+
+    with Pool(workers) as pool:
+        if state['current_score'] is None:
+            state['current_score'] = evaluate_fleet(pool, state['current'], state['shooter'], state['seeds'], workers)
+            state['pool'] = update_pool(state['pool'], state['current_score'], state['current'], pool_size)
+
+        while state['iteration'] < iterations:
+            state['iteration'] += 1
+            temperature = start_temperature * (1 - state['iteration'] / iterations) + 1e-9
+
+            candidate = mutate_fleet(state['current'], rng)
+            score = evaluate_fleet(pool, candidate, state['shooter'], state['seeds'], workers)
+
+            improvement = score - state['current_score']
+            if improvement >= 0 or rng.random() < math.exp(improvement / temperature):
+                state['current'], state['current_score'] = candidate, score
+                state['pool'] = update_pool(state['pool'], score, candidate, pool_size)
+
+            if state['iteration'] % checkpoint_every == 0 or state['iteration'] == iterations:
+                state['rng_state'] = rng.getstate()
+                save_checkpoint(checkpoint, state)
+                save_layouts_to_csv([s for _, s in state['pool']], [score for score, _ in state['pool']], output)
+                print(f"Iteration {state['iteration']}/{iterations}: "
+                      f"current {state['current_score']:.2f}, best {state['pool'][0][0]:.2f} shots")
+
+        # Fresh seeds, none of them used by the search, drawn after it so a resumed run gets the same ones
+        search_seeds = set(state['seeds'])
+        validation_seeds = []
+        while len(validation_seeds) < validation_games:
+            candidate_seed = rng.randrange(2**31)
+            if candidate_seed not in search_seeds:
+                validation_seeds.append(candidate_seed)
+        print(f"Re-scoring the {len(state['pool'])} best layouts on {validation_games} fresh games "
+              f"(best on the search games: {state['pool'][0][0]:.2f} shots)")
+        state['pool'] = validate_pool(pool, state['pool'], state['shooter'], validation_seeds, workers)
+        state['validated'] = True
+        save_checkpoint(checkpoint, state)
+        save_layouts_to_csv([s for _, s in state['pool']], [score for score, _ in state['pool']], output)
+
+    return state['pool']
+
+def main():
+    parser = argparse.ArgumentParser(description="Search for bot fleet layouts that are hard to sink")
+    parser.add_argument('--iterations', type=int, default=2000, help="Annealing steps")
+    parser.add_argument('--games', type=int, default=200, help="Headless games per layout evaluation")
+    parser.add_argument('--shooter', choices=sorted(SHOOTERS), default='bot', help="Shooter strategy to play against")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--pool-size', type=int, default=20, help="Number of best layouts to keep")
+    parser.add_argument('--temperature', type=float, default=1.0, help="Starting annealing temperature (in shots)")
+    parser.add_argument('--checkpoint', default='data/optimizer_checkpoint.json', help="Checkpoint file (resumed if present)")
+    parser.add_argument('--output', default='data/hard_layouts.csv', help="Hard layout pool for setup_game")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for a fresh run")
+    parser.add_argument('--validation-games', type=int, default=1000,
+                        help="Fresh games the final pool is re-scored on")
+    args = parser.parse_args()
+
+    os.makedirs('data', exist_ok=True)
+    try:
+        pool = optimize_placement(args.iterations, args.games, args.shooter, args.workers, args.pool_size,
+                                  args.temperature, args.checkpoint, args.output, seed=args.seed,
+                                  validation_games=args.validation_games)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"\nSaved {len(pool)} layouts to {args.output} (best: {pool[0][0]:.2f} shots)")
+
+if __name__ == "__main__":
+    main()
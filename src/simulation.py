@@ -0,0 +1,175 @@
+import argparse
+import os
+import random
+from typing import Callable, Dict, List, Tuple
+from src.bot_generation import generate_bot_ships
+from src.density import DensityEngine
+from src.fleet_sampling import sample_fleet
+from src.events import EventBus, SocketFeed, move_events
+from src.game_archive import GameArchiveWriter, result_code
+from src.gameplay import SALVO_SHIPS, GameState
+from src.utils import *
+
+def bot_shooter(game_state: GameState) -> Tuple[int, int]:
+    """The game's own bot AI (random hunting plus adjacent/axis targeting)"""
+    return game_state.get_bot_move('classic')
+
+def density_shooter(game_state: GameState) -> Tuple[int, int]:
+    """Fire at the cell covered by the most legal placements of the remaining ships"""
+    return game_state.get_bot_move('density')
+
+def learned_shooter(game_state: GameState) -> Tuple[int, int]:
+    """Fire where the model trained by src.learned_policy scores a ship most likely"""
+    return game_state.get_bot_move('learned')
+
+# Shooter strategies available to headless games, by name so they can be
+# chosen from the command line and sent to worker processes
+SHOOTERS: Dict[str, Callable[[GameState], Tuple[int, int]]] = {
+    'bot': bot_shooter,
+    'density': density_shooter,
+    'learned': learned_shooter,
+}
+
+def bot_salvo_shooter(game_state: GameState, shots: int) -> List[Tuple[int, int]]:
+    """The game's own bot AI, choosing a whole salvo at once"""
+    return game_state.get_bot_salvo(shots, 'classic')
+
+def density_salvo_shooter(game_state: GameState, shots: int) -> List[Tuple[int, int]]:
+    """The densest cells of one placement heatmap, spread out while hunting"""
+    return game_state.get_bot_salvo(shots, 'density')
+
+def learned_salvo_shooter(game_state: GameState, shots: int) -> List[Tuple[int, int]]:
+    """The best cells of one evaluation of the trained model, spread out while hunting"""
+    return game_state.get_bot_salvo(shots, 'learned')
+
+# The same strategies for salvo games, where a side fires several shots per turn
+SALVO_SHOOTERS: Dict[str, Callable[[GameState, int], List[Tuple[int, int]]]] = {
+    'bot': bot_salvo_shooter,
+    'density': density_salvo_shooter,
+    'learned': learned_salvo_shooter,
+}
+
+def shots_to_sink(ships: List[List[Tuple[int, int]]], shooter: str = 'bot', seed: int = None) -> int:
+    """
+    Let a shooter fire at a fleet until every ship is sunk and return the number of shots.
+
+    The fleet is placed on the player's side of a headless GameState and the
+    shooter plays the bot, so cells marked as miss around sunk ships are not
+    counted as shots.
+    """
+    if seed is not None:
+        random.seed(seed)
+
+    game_state = GameState(ships, ships)
+    choose_move = SHOOTERS[shooter]
+    shots = 0
+
+    while not all(game_state.player_destroyed):
+        coord = choose_move(game_state)
+        is_hit, ship_destroyed = game_state.process_move(coord, False)
+        game_state.update_bot_state(coord, is_hit, ship_destroyed)
+        shots += 1
+
+    return shots
+
+def play_headless_game(player_ships: List[List[Tuple[int, int]]], bot_ships: List[List[Tuple[int, int]]],
+                       player_shooter: str = 'bot', bot_shooter: str = 'bot',
+                       seed: int = None, bus: EventBus = None, game_id: str = '0',
+                       salvo: int = None, density_engine: DensityEngine = None
+                       ) -> Tuple[str, List[Tuple[bool, Tuple[int, int], int]]]:
+    """
+    Play a full game without any input or output, both sides driven by shooter strategies.
+
+    With `salvo` set, each side fires that many shots per turn (one per ship
+    still afloat for SALVO_SHIPS) and the shots of a salvo are chosen and
+    resolved together.
+    Returns the winner ('player' or 'bot') and the list of moves as
+    (is_player, coord, result) with the result codes of src.game_archive.
+    Every move is also published to `bus` if one is given, and density
+    shooters compute their heatmaps on `density_engine` if one is given.
+    """
+    if seed is not None:
+        random.seed(seed)
+
+    game_state = GameState(player_ships, bot_ships)
+    # The player's AI needs its own bot state: a mirrored game where the bot fires at the bot fleet
+    player_view = GameState(bot_ships, player_ships)
+    game_state.density_engine = player_view.density_engine = density_engine
+    moves = []
+
+    def choose_moves(view: GameState, is_player: bool) -> List[Tuple[int, int]]:
+        shooter = player_shooter if is_player else bot_shooter
+        if salvo is None:
+            return [SHOOTERS[shooter](view)]
+        return SALVO_SHOOTERS[shooter](view, game_state.salvo_size(is_player, salvo))
+
+    while True:
+        game_state.turn += 1
+
+        for is_player, view in ((True, player_view), (False, game_state)):
+            coords = choose_moves(view, is_player)
+            results = game_state.process_moves(coords, is_player)
+            if is_player:
+                player_view.process_moves(coords, False)
+            for coord, (is_hit, ship_destroyed) in zip(coords, results):
+                view.update_bot_state(coord, is_hit, ship_destroyed)
+                moves.append((is_player, coord, result_code(is_hit, ship_destroyed)))
+            if bus:
+                for event in move_events(game_id, game_state, is_player, coords, results):
+                    bus.publish(event)
+
+            game_over, winner = game_state.is_game_over()
+            if game_over:
+                return winner, moves
+
+def main():
+    parser = argparse.ArgumentParser(description="Play headless games and append them to a game archive")
+    parser.add_argument('--games', type=int, default=1000, help="Number of games to play")
+    parser.add_argument('--archive', default='data/games.bsa', help="Archive to append to")
+    parser.add_argument('--player-shooter', choices=sorted(SHOOTERS), default='bot')
+    parser.add_argument('--bot-shooter', choices=sorted(SHOOTERS), default='bot')
+    parser.add_argument('--uniform', action='store_true', help="Sample fleets uniformly (src.fleet_sampling)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--events', default=None, metavar='SOCKET', help="Publish every move on this Unix socket")
+    parser.add_argument('--salvo', type=int, default=None, metavar='K',
+                        help=f"Salvo rules: K shots per turn ({SALVO_SHIPS} = one per ship afloat)")
+    parser.add_argument('--density-workers', type=int, default=None, metavar='N',
+                        help="Compute density heatmaps on a pool of N worker processes (src.density)")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.archive) or '.', exist_ok=True)
+    rng = random.Random(args.seed)
+    wins = {'player': 0, 'bot': 0}
+    bus = feed = density_engine = None
+    if args.events:
+        bus = EventBus()
+        try:
+            feed = SocketFeed(bus, args.events)
+        except OSError as e:
+            parser.error(f"cannot publish on {args.events}: {e}")
+    if args.density_workers:
+        density_engine = DensityEngine(BOARD_SIZE, args.density_workers)
+
+    with GameArchiveWriter(args.archive) as archive:
+        first_game_id = archive.count
+        for game in range(args.games):
+            if args.uniform:
+                player_ships, bot_ships = sample_fleet(rng=rng), sample_fleet(rng=rng)
+            else:
+                player_ships, bot_ships = generate_bot_ships(), generate_bot_ships()
+            winner, moves = play_headless_game(player_ships, bot_ships, args.player_shooter,
+                                               args.bot_shooter, seed=rng.randrange(2**31),
+                                               bus=bus, game_id=str(first_game_id + game), salvo=args.salvo,
+                                               density_engine=density_engine)
+            archive.append(player_ships, bot_ships, moves, args.salvo is not None)
+            wins[winner] += 1
+
+    if feed:
+        feed.close()
+    if density_engine:
+        density_engine.close()
+    print(f"Played {args.games} games (player {wins['player']}, bot {wins['bot']}); "
+          f"{args.archive} now holds {archive.count} games")
+
+if __name__ == "__main__":
+    main()
@@ -53,6 +53,28 @@ def load_ships_from_csv(filename: str) -> List[Set[Tuple[int, int]]]:
             ships[ship_id].add((int(row['row']), int(row['col'])))
     return [ships[i] for i in sorted(ships.keys())]
 
+def save_layouts_to_csv(layouts: List[List[List[Tuple[int, int]]]], scores: List[float], filename: str):
+    """Save a pool of fleet layouts (with their scores) to CSV"""
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['layout_id', 'score', 'ship_id', 'size', 'row', 'col'])
+        for layout_id, (ships, score) in enumerate(zip(layouts, scores)):
+            for ship_id, ship in enumerate(ships):
+                for row, col in ship:
+                    writer.writerow([layout_id, score, ship_id, len(ship), row, col])
+
+def load_layouts_from_csv(filename: str) -> List[Tuple[float, List[List[Tuple[int, int]]]]]:
+    """Load a pool of fleet layouts from CSV as (score, ships) pairs"""
+    layouts = {}
+    with open(filename, 'r') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            layout_id = int(row['layout_id'])
+            score, ships = layouts.setdefault(layout_id, (float(row['score']), {}))
+            ships.setdefault(int(row['ship_id']), []).append((int(row['row']), int(row['col'])))
+    return [(score, [sorted(ships[i]) for i in sorted(ships)]) for score, ships in
+            (layouts[i] for i in sorted(layouts))]
+
 def coord_to_str(row: int, col: int) -> str:
     """Convert (row, col) to chess notation like 'A1'"""
     return f"{chr(ord('A') + col)}{row + 1}"